@@ -0,0 +1,148 @@
+import argparse
+import json
+import time
+from sqlalchemy import event, func, select
+from app import create_app
+from extensions import db
+from models import Product, Order
+from benchmarks.seed import add_database_argument, benchmark_database_url, report_config, seed
+from benchmarks.run import percentile
+
+'''
+Benchmark for the filters on GET /products and GET /orders. Seeds a large catalog (a million products and orders by default), then times every filter through the
+test client with our indexes in place and again after dropping them, and prints the database's query plan for each so you can see which index was picked.
+
+    python -m benchmarks.filters --products 1000000 --orders 1000000 --output filters.json
+
+The catalog cache is turned off so every request reaches the database. On SQLite the name prefix filter always scans, since SQLite's LIKE ignores case and so
+cannot use a plain index, MySQL's case insensitive collations can.
+'''
+
+
+FILTERS = {
+    "products_by_type": "/products?type=toy",
+    "products_by_name_prefix": "/products?name=Product%2012345",
+    "products_by_price_range": "/products?min_price=100&max_price=101",
+    "products_by_type_and_price": "/products?type=toy&min_price=100&max_price=101",
+    "orders_by_customer": "/orders?customer_id=4242",
+    "orders_by_customer_and_dates": "/orders?customer_id=4242&date_from=2021-01-01&date_to=2021-12-31",
+    "orders_by_status": "/orders?status=cancelled",
+    "orders_by_date_range": "/orders?date_from=2021-03-01&date_to=2021-03-07",
+}
+
+# The filtered requests we time, each one returns the first page (100 rows) of matches
+
+
+def explain(statement, parameters):
+    if db.engine.dialect.name == 'sqlite':
+        rows = db.session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+        return [row[-1] for row in rows]
+    rows = db.session.connection().exec_driver_sql("EXPLAIN " + statement, parameters).mappings().all()
+    return [f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']} {row['Extra'] or ''}".strip() for row in rows]
+
+# Asks the database how it runs a statement, SQLite and MySQL format their plans differently so we boil both down to one line per step
+
+
+def time_filters(app, requests):
+    client = app.test_client()
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    results = {}
+    for name, path in FILTERS.items():
+        statements.clear()
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        response = client.get(path)
+        event.remove(db.engine, 'before_cursor_execute', capture)
+        plan = explain(*statements[0]) if statements else []
+
+        latencies = []
+        for i in range(requests):
+            start = time.perf_counter()
+            client.get(path)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        results[name] = {
+            "path": path,
+            "rows": len(response.json),
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "plan": plan,
+        }
+    return results
+
+'''
+Sends each filtered request once to capture the query it runs and get its plan, then requests times in a row to time it. The first statement a request runs is
+the filtered select, later ones are the lines loaded for a page of orders.
+'''
+
+
+def run(args):
+    database_url = benchmark_database_url(args, 'filters')
+    app = create_app({"SQLALCHEMY_DATABASE_URI": database_url, "CATALOG_CACHE_TTL": 0, "METRICS_ENABLED": False})
+    indexes = list(Product.__table__.indexes) + list(Order.__table__.indexes)
+    with app.app_context():
+        if not (args.reuse and db.session.execute(select(func.count()).select_from(Order)).scalar()):
+            seed(args.customers, args.products, args.orders, args.items, args.seed)
+        report = {"config": report_config(database_url, customers=args.customers, products=args.products, orders=args.orders, requests=args.requests),
+                  "indexed": time_filters(app, args.requests)}
+
+        db.session.remove()
+        for index in indexes:
+            index.drop(db.engine)
+        db.engine.dispose()
+        try:
+            report["unindexed"] = time_filters(app, args.requests)
+        finally:
+            db.session.remove()
+            for index in indexes:
+                index.create(db.engine)
+            db.engine.dispose()
+    return report
+
+'''
+Seeds the database (or reuses it with --reuse), times every filter with the indexes from models.py, then drops those indexes, times them again and puts the indexes
+back so the database is left the way we found it. The pool is emptied after each change since SQLite connections can keep handing back plans prepared before it.
+'''
+
+
+def print_report(report):
+    print(f"{'filter':<32}{'rows':>6}{'indexed p50 ms':>18}{'unindexed p50 ms':>20}{'speedup':>10}")
+    for name, indexed in report['indexed'].items():
+        unindexed = report['unindexed'][name]
+        speedup = unindexed['p50_ms'] / indexed['p50_ms'] if indexed['p50_ms'] else 0.0
+        print(f"{name:<32}{indexed['rows']:>6}{indexed['p50_ms']:>18.2f}{unindexed['p50_ms']:>20.2f}{speedup:>9.1f}x")
+    for name, indexed in report['indexed'].items():
+        print(f"\n{name}  {indexed['path']}")
+        print("  indexed:   " + "\n             ".join(indexed['plan']))
+        print("  unindexed: " + "\n             ".join(report['unindexed'][name]['plan']))
+
+# Prints a side by side table of the timings followed by the query plans
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the product and order filters with and without their indexes")
+    add_database_argument(parser)
+    parser.add_argument('--customers', type=int, default=100000)
+    parser.add_argument('--products', type=int, default=1000000)
+    parser.add_argument('--orders', type=int, default=1000000)
+    parser.add_argument('--items', type=int, default=1, help="products per seeded order")
+    parser.add_argument('--requests', type=int, default=50, help="requests sent per filter")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reuse', action='store_true', help="keep the data already in the database instead of reseeding")
+    parser.add_argument('--output', help="also write the JSON report here")
+    args = parser.parse_args()
+
+    report = run(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(json.dumps(report, indent=2) + "\n")
+
+# Command line entry point, see the usage at the top of this file
+
+
+if __name__ == "__main__":
+    main()
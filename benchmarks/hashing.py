@@ -0,0 +1,99 @@
+import argparse
+import itertools
+import json
+import random
+import threading
+from sqlalchemy import event
+from werkzeug.serving import make_server
+from app import create_app
+from extensions import db
+from benchmarks.seed import add_database_argument, benchmark_database_url, report_config, seed
+from benchmarks.run import QueryCounter, QuietRequestHandler, run_http
+
+'''
+Shows how catalog reads hold up while accounts are being created, with passwords hashed inline on the request thread and with the password hashing pool. For each mode
+it seeds a fresh database, then sends GET /products pages from one group of threads while another group signs up new accounts at the same time, and reports the
+latency and throughput of each group separately.
+
+    python -m benchmarks.hashing --reads 2000 --signups 200 --output hashing.json
+'''
+
+
+def run_mode(args, database_url, mode):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": database_url,
+        "METRICS_ENABLED": False,
+        "CATALOG_CACHE_TTL": 0,
+        "PASSWORD_HASH_METHOD": args.method,
+        "PASSWORD_HASH_WORKERS": args.workers if mode == 'pool' else 0,
+        "PASSWORD_HASH_MAX_PENDING": args.max_pending if mode == 'pool' else args.signup_threads,
+        "PASSWORD_HASH_WAIT_TIMEOUT": 60,
+    })
+    counter = QueryCounter()
+    with app.app_context():
+        seed(args.customers, args.products, 0, 1, args.seed)
+        event.listen(db.engine, 'before_cursor_execute', counter)
+
+    rng = random.Random(args.seed)
+    usernames = itertools.count()
+
+    def read_products():
+        return "GET", f"/products?limit=100&after={rng.randint(0, max(args.products - 100, 0))}", None
+
+    def sign_up():
+        return "POST", "/accounts", {"username": f"user{next(usernames)}", "password": "correct horse battery staple", "customer_id": rng.randint(1, args.customers)}
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    try:
+        # start the pool's worker processes before timing anything
+        app.extensions['password_hasher'].hash("warm up")
+        results = {}
+        signups = threading.Thread(target=lambda: results.update(signups=run_http(base_url, sign_up, args.signups, args.signup_threads, counter)))
+        signups.start()
+        results['reads'] = run_http(base_url, read_products, args.reads, args.read_threads, counter)
+        signups.join()
+    finally:
+        server.shutdown()
+        app.extensions['password_hasher'].shutdown()
+    return results
+
+'''
+Runs one mode from a freshly seeded database and returns run_http's numbers for the reads and the signups, which run at the same time. The catalog cache is turned off
+so every read does real work.
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare catalog reads during a signup burst with inline and pooled password hashing")
+    add_database_argument(parser)
+    parser.add_argument('--customers', type=int, default=1000)
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--reads', type=int, default=2000, help="GET /products requests per mode")
+    parser.add_argument('--read-threads', type=int, default=8)
+    parser.add_argument('--signups', type=int, default=200, help="POST /accounts requests per mode")
+    parser.add_argument('--signup-threads', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=2, help="hashing processes in pool mode")
+    parser.add_argument('--max-pending', type=int, default=8, help="hashes allowed to run or wait at once in pool mode")
+    parser.add_argument('--method', default='scrypt', help="werkzeug hashing method, like scrypt or pbkdf2:sha256:600000")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    database_url = benchmark_database_url(args, 'hashing')
+    report = {"config": report_config(database_url, args),
+              "results": {mode: run_mode(args, database_url, mode) for mode in ('inline', 'pool')}}
+    report = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(report + "\n")
+    else:
+        print(report)
+
+# Command line entry point, see the usage at the top of this file
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import argparse
+import json
+import random
+import sys
+import threading
+from sqlalchemy import event, func, select
+from werkzeug.serving import make_server
+from app import create_app
+from extensions import db
+from models import CustomerOrderSummary, Order, OrderItem
+from summaries import rebuild_customer_summaries
+from benchmarks.seed import add_database_argument, benchmark_database_url, report_config, seed
+from benchmarks.run import QueryCounter, QuietRequestHandler, run_http
+
+'''
+Concurrency check for PATCH /orders/<id>/items. Seeds a database, then fires PATCH requests from many threads at once at a handful of hot orders, each one adding a
+unit of a product picked from a small pool so the writers keep colliding on the same orders and the same lines. Afterwards it checks that no change was lost: the
+quantities on the hot orders must have gone up by exactly the number of successful requests, every order total must equal the sum of its lines, and the customer
+summaries must match a full rebuild. It exits with an error when any of that does not hold or a request failed.
+
+    python -m benchmarks.order_items --requests 2000 --threads 16 --hot-orders 2 --output order_items.json
+'''
+
+
+def hot_order_quantity(hot_orders):
+    return db.session.execute(select(func.coalesce(func.sum(OrderItem.quantity), 0)).where(OrderItem.order_id.in_(hot_orders))).scalar()
+
+# Adds up every quantity on the hot orders
+
+
+def check_consistency(hot_orders, expected_quantity):
+    line_totals = select(OrderItem.order_id, func.sum(OrderItem.quantity * OrderItem.unit_price).label("lines")).group_by(OrderItem.order_id).subquery()
+    mismatched_totals = db.session.execute(select(func.count()).select_from(Order).join(line_totals, line_totals.c.order_id == Order.order_id)
+                                           .where(func.abs(Order.total_price - line_totals.c.lines) >= 0.005)).scalar()
+    summaries = db.session.execute(select(CustomerOrderSummary.customer_id, CustomerOrderSummary.order_count, CustomerOrderSummary.lifetime_spend)
+                                   .order_by(CustomerOrderSummary.customer_id)).all()
+    rebuild_customer_summaries()
+    rebuilt = db.session.execute(select(CustomerOrderSummary.customer_id, CustomerOrderSummary.order_count, CustomerOrderSummary.lifetime_spend)
+                                 .order_by(CustomerOrderSummary.customer_id)).all()
+    actual_quantity = hot_order_quantity(hot_orders)
+    return {
+        "expected_quantity": expected_quantity,
+        "actual_quantity": actual_quantity,
+        "lost_updates": expected_quantity - actual_quantity,
+        "orders_with_wrong_total": mismatched_totals,
+        "summaries_match_rebuild": summaries == rebuilt,
+    }
+
+'''
+Compares what the database ended up with against what the successful requests should have produced. Summaries are compared before and after rebuild-summaries, which
+recomputes them from scratch.
+'''
+
+
+def consistency_failures(result):
+    consistency = result["consistency"]
+    failures = []
+    if result["errors"]:
+        failures.append(f"{result['errors']} requests failed")
+    if consistency["lost_updates"]:
+        failures.append(f"{consistency['lost_updates']} units added by successful requests are missing")
+    if consistency["orders_with_wrong_total"]:
+        failures.append(f"{consistency['orders_with_wrong_total']} orders have a total that does not match their lines")
+    if not consistency["summaries_match_rebuild"]:
+        failures.append("customer summaries do not match a rebuild")
+    return failures
+
+# Returns what went wrong in a run, or an empty list. A failed request counts too, since with the order locked writers should wait their turn instead of erroring
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hammer PATCH /orders/<id>/items from parallel writers and check that no change was lost")
+    add_database_argument(parser)
+    parser.add_argument('--customers', type=int, default=100)
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--orders', type=int, default=1000)
+    parser.add_argument('--items', type=int, default=3, help="products per seeded order")
+    parser.add_argument('--hot-orders', type=int, default=2, help="how many orders every writer changes")
+    parser.add_argument('--product-pool', type=int, default=10, help="how many different products the writers add")
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=16, help="parallel writers")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    database_url = benchmark_database_url(args, 'order_items')
+    app = create_app({"SQLALCHEMY_DATABASE_URI": database_url, "METRICS_ENABLED": False})
+    hot_orders = list(range(1, args.hot_orders + 1))
+    counter = QueryCounter()
+    with app.app_context():
+        seed(args.customers, args.products, args.orders, args.items, args.seed)
+        quantity_before = hot_order_quantity(hot_orders)
+        event.listen(db.engine, 'before_cursor_execute', counter)
+
+    rng = random.Random(args.seed)
+
+    def add_item():
+        return "PATCH", f"/orders/{rng.choice(hot_orders)}/items", {"add": [{"product_id": rng.randint(1, args.product_pool), "quantity": 1}]}
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        result = run_http(f"http://127.0.0.1:{server.server_port}", add_item, args.requests, args.threads, counter)
+    finally:
+        server.shutdown()
+
+    with app.app_context():
+        event.remove(db.engine, 'before_cursor_execute', counter)
+        result["consistency"] = check_consistency(hot_orders, quantity_before + result["requests"] - result["errors"])
+    failures = consistency_failures(result)
+    report = {"config": report_config(database_url, args),
+              "results": result, "failures": failures}
+    report = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(report + "\n")
+    else:
+        print(report)
+    if failures:
+        sys.exit("Order line changes were not consistent: " + "; ".join(failures))
+
+# Command line entry point, see the usage at the top of this file. Exits with status 1 when consistency_failures finds a problem
+
+
+if __name__ == "__main__":
+    main()
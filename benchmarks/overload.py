@@ -0,0 +1,173 @@
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from werkzeug.serving import make_server
+from app import create_app
+from benchmarks.seed import add_database_argument, benchmark_database_url, report_config, seed
+from benchmarks.run import QuietRequestHandler, percentile, scenarios
+
+'''
+Shows what one noisy client does to everybody else, with and without admission control. For each mode it seeds a fresh database and starts a local server, then for
+--duration seconds a noisy client hammers GET /orders from many threads at once while a few well behaved clients each fetch single orders at a steady pace. It reports
+the status codes, successful throughput and latency of each group, so you can see the noisy client being turned away with 429s and 503s while the others keep
+getting fast answers. It exits with an error when the protected mode did not protect the quiet clients, see check_protection.
+
+    python -m benchmarks.overload --duration 20 --noisy-threads 32 --quiet-clients 4 --output overload.json
+'''
+
+
+class ClientGroup:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self._lock = threading.Lock()
+
+    def record(self, status, elapsed):
+        with self._lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if 200 <= status < 300:
+                self.latencies.append(elapsed)
+
+    def report(self, elapsed):
+        latencies = sorted(self.latencies)
+        return {
+            "requests": sum(self.statuses.values()),
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+            "ok_per_second": len(latencies) / elapsed if elapsed else 0.0,
+            "ok_latency_ms": {
+                "p50": percentile(latencies, 50) * 1000,
+                "p95": percentile(latencies, 95) * 1000,
+                "p99": percentile(latencies, 99) * 1000,
+            },
+        }
+
+# Collects the status codes of every request one group of clients sent and the latency of the ones that succeeded
+
+
+def send(base_url, method, path, body, api_key):
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(base_url + path, data=data, method=method, headers={"Content-Type": "application/json", "X-API-Key": api_key})
+    try:
+        with urllib.request.urlopen(request) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as err:
+        err.read()
+        return err.code
+    except OSError:
+        return 0
+
+# Sends one request and returns its status code, or 0 when the connection itself failed
+
+
+def client_loop(base_url, make_request, api_key, group, stop_at, interval=0.0):
+    while time.perf_counter() < stop_at:
+        method, path, body = make_request()
+        start = time.perf_counter()
+        status = send(base_url, method, path, body, api_key)
+        elapsed = time.perf_counter() - start
+        group.record(status, elapsed)
+        if interval:
+            time.sleep(max(interval - elapsed, 0))
+
+# Keeps sending requests until stop_at, back to back or one every interval seconds
+
+
+def run_mode(args, database_url, mode):
+    config = {"SQLALCHEMY_DATABASE_URI": database_url, "METRICS_ENABLED": False, "CATALOG_CACHE_TTL": 0}
+    if mode == 'protected':
+        config.update(RATE_LIMIT_ENABLED=True, RATE_LIMIT_PER_SECOND=args.rate, RATE_LIMIT_BURST=args.burst,
+                      MAX_CONCURRENT_REQUESTS=args.max_concurrent, CONCURRENCY_WAIT_MS=args.concurrency_wait_ms)
+    app = create_app(config)
+    counts = {"customers": args.customers, "products": args.products, "orders": args.orders, "items": args.items}
+    with app.app_context():
+        seed(args.customers, args.products, args.orders, args.items, args.seed)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    noisy, quiet = ClientGroup(), ClientGroup()
+    try:
+        started = time.perf_counter()
+        stop_at = started + args.duration
+        threads = [threading.Thread(target=client_loop, args=(base_url, scenarios(counts, random.Random(args.seed + i))['list_orders'], "noisy", noisy, stop_at))
+                   for i in range(args.noisy_threads)]
+        threads += [threading.Thread(target=client_loop, args=(base_url, scenarios(counts, random.Random(-i))['get_order'], f"quiet-{i}", quiet, stop_at, 1 / args.quiet_rate))
+                    for i in range(args.quiet_clients)]
+        for client in threads:
+            client.start()
+        for client in threads:
+            client.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        server.shutdown()
+    return {"noisy": noisy.report(elapsed), "quiet": quiet.report(elapsed)}
+
+'''
+Runs one mode from a freshly seeded database. The noisy client sends GET /orders pages back to back from noisy_threads threads under a single API key, and every quiet
+client sends GET /orders/<id> quiet_rate times a second under its own key. The catalog cache is turned off so every request reaches the database.
+'''
+
+
+def check_protection(args, results):
+    noisy, quiet = results["protected"]["noisy"], results["protected"]["quiet"]
+    expected = args.quiet_clients * args.quiet_rate
+    failures = []
+    if not noisy["statuses"].get("429") and not noisy["statuses"].get("503"):
+        failures.append("the noisy client was never turned away")
+    if quiet["statuses"].get("429"):
+        failures.append(f"quiet clients were rate limited {quiet['statuses']['429']} times")
+    if quiet["ok_per_second"] < 0.8 * expected:
+        failures.append(f"quiet clients got {quiet['ok_per_second']:.1f} answers a second instead of about {expected:.1f}")
+    return failures
+
+'''
+Returns what went wrong in protected mode, or an empty list. The noisy client has to have been turned away at least once, the quiet clients must never get a 429
+since each of them stays well under its own limit, and they must get at least 80% of the answers a second they asked for.
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare how well behaved clients fare next to a noisy one with and without admission control")
+    add_database_argument(parser)
+    parser.add_argument('--customers', type=int, default=1000)
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--items', type=int, default=5)
+    parser.add_argument('--duration', type=float, default=20, help="seconds each mode runs for")
+    parser.add_argument('--noisy-threads', type=int, default=32, help="threads the noisy client sends from")
+    parser.add_argument('--quiet-clients', type=int, default=4)
+    parser.add_argument('--quiet-rate', type=float, default=5, help="requests a second from each quiet client")
+    parser.add_argument('--rate', type=float, default=20, help="tokens a second each client gets in protected mode")
+    parser.add_argument('--burst', type=int, default=40, help="most tokens a client can save up in protected mode")
+    parser.add_argument('--max-concurrent', type=int, default=8, help="requests handled at once in protected mode")
+    parser.add_argument('--concurrency-wait-ms', type=float, default=100, help="how long a request waits for a slot in protected mode")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    database_url = benchmark_database_url(args, 'overload')
+    results = {mode: run_mode(args, database_url, mode) for mode in ('unprotected', 'protected')}
+    failures = check_protection(args, results)
+    report = {"config": report_config(database_url, args),
+              "results": results, "failures": failures}
+    report = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(report + "\n")
+    else:
+        print(report)
+    if failures:
+        sys.exit("Admission control did not protect the quiet clients: " + "; ".join(failures))
+
+# Command line entry point, see the usage at the top of this file. Exits with status 1 when check_protection finds a problem
+
+
+if __name__ == "__main__":
+    main()
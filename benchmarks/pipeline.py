@@ -0,0 +1,95 @@
+import argparse
+import json
+import random
+import threading
+import time
+from sqlalchemy import event, func, select
+from werkzeug.serving import make_server
+from app import create_app
+from extensions import db
+from models import Order
+from benchmarks.seed import add_database_argument, benchmark_database_url, report_config, seed
+from benchmarks.run import QueryCounter, QuietRequestHandler, run_http, scenarios
+
+'''
+Compares placing orders synchronously with the async order pipeline. For each mode it seeds a fresh database, fires POST /orders at a local server from a pool of
+threads, and reports how fast orders were accepted (throughput and latency as clients saw them) and, for async mode, how long it took until every order was
+actually committed.
+
+    python -m benchmarks.pipeline --requests 2000 --threads 16 --batch-size 100 --output pipeline.json
+'''
+
+
+def run_mode(args, database_url, mode):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": database_url,
+        "METRICS_ENABLED": False,
+        "ORDER_PIPELINE": mode,
+        "ORDER_PIPELINE_WORKERS": args.workers,
+        "ORDER_PIPELINE_BATCH_SIZE": args.batch_size,
+        "ORDER_PIPELINE_BATCH_WAIT_MS": args.batch_wait_ms,
+        "ORDER_PIPELINE_MAX_QUEUE": max(args.requests, 1),
+    })
+    counter = QueryCounter()
+    counts = {"customers": args.customers, "products": args.products, "orders": 0, "items": args.items}
+    with app.app_context():
+        seed(args.customers, args.products, 0, args.items, args.seed)
+        event.listen(db.engine, 'before_cursor_execute', counter)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        place_order = scenarios(counts, random.Random(args.seed))['place_order']
+        started = time.perf_counter()
+        result = run_http(f"http://127.0.0.1:{server.server_port}", place_order, args.requests, args.threads, counter)
+        pipeline = app.extensions.get('order_pipeline')
+        if pipeline is not None:
+            pipeline.join()
+            pipeline.stop()
+        elapsed = time.perf_counter() - started
+    finally:
+        server.shutdown()
+
+    with app.app_context():
+        committed = db.session.execute(select(func.count()).select_from(Order)).scalar()
+    result['committed_orders'] = committed
+    result['committed_per_second'] = committed / elapsed if elapsed else 0.0
+    return result
+
+'''
+Runs one mode from a freshly seeded database (with no orders) and returns run_http's numbers plus how many orders ended up in the database and how many were committed
+per second from the first request until the pipeline's queue was empty. queries_per_request also counts the statements the pipeline workers ran.
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare synchronous order placement with the async order pipeline")
+    add_database_argument(parser)
+    parser.add_argument('--customers', type=int, default=1000)
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--items', type=int, default=5, help="products per placed order")
+    parser.add_argument('--requests', type=int, default=2000, help="orders placed per mode")
+    parser.add_argument('--threads', type=int, default=16, help="concurrent clients")
+    parser.add_argument('--workers', type=int, default=2, help="pipeline worker threads")
+    parser.add_argument('--batch-size', type=int, default=100, help="most orders a pipeline worker commits at once")
+    parser.add_argument('--batch-wait-ms', type=float, default=5, help="how long a pipeline worker waits to fill a batch")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    database_url = benchmark_database_url(args, 'pipeline')
+    report = {"config": report_config(database_url, args),
+              "results": {mode: run_mode(args, database_url, mode) for mode in ('sync', 'async')}}
+    report = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(report + "\n")
+    else:
+        print(report)
+
+# Command line entry point, see the usage at the top of this file
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import event, func, select
+from werkzeug.serving import make_server, WSGIRequestHandler
+from app import create_app
+from extensions import db
+from models import Customer, Product, Order
+from benchmarks.seed import add_database_argument, benchmark_database_url, report_config, seed
+
+'''
+Benchmark harness for our hot endpoints. Seeds a database with a configurable number of customers, products and orders, then drives the real routes through the Flask
+test client and through a multi-threaded HTTP load generator against a local server, and reports throughput, latency percentiles and queries per request as JSON.
+
+    python -m benchmarks.run --customers 1000 --products 500 --orders 5000 --items 5 --output before.json
+    python -m benchmarks.run --compare before.json after.json
+
+Like every benchmark here it wipes the database it seeds, so see benchmark_database_url in seed.py for which one that is.
+'''
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, *args):
+        with self._lock:
+            self.count += 1
+
+# Counts every SQL statement the app runs, hooked onto the engine with before_cursor_execute
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+# Request handler for our local server that skips the access log, printing a line per request would slow down the run we are measuring
+
+
+def scenarios(counts, rng):
+    def random_order():
+        product_ids = rng.sample(range(1, counts['products'] + 1), min(counts['items'], counts['products']))
+        return {"customer_id": rng.randint(1, counts['customers']), "date": "2024-01-01", "order_status": "pending", "products": product_ids}
+
+    return {
+        "list_products": lambda: ("GET", f"/products?limit=100&after={rng.randint(0, max(counts['products'] - 100, 0))}", None),
+        "get_product": lambda: ("GET", f"/products/{rng.randint(1, counts['products'])}", None),
+        "list_orders": lambda: ("GET", f"/orders?limit=100&after={rng.randint(0, max(counts['orders'] - 100, 0))}", None),
+        "get_order": lambda: ("GET", f"/orders/{rng.randint(1, counts['orders'])}", None),
+        "place_order": lambda: ("POST", "/orders", random_order()),
+    }
+
+# The requests each scenario sends, every call returns a method, path and JSON body picked at random from the seeded data
+
+
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(percent / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+# Nearest rank percentile of an already sorted list
+
+
+def summarize(latencies, errors, elapsed, queries):
+    latencies = sorted(latencies)
+    total = len(latencies)
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "mean": sum(latencies) / total * 1000 if total else 0.0,
+            "p50": percentile(latencies, 50) * 1000,
+            "p95": percentile(latencies, 95) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+            "max": latencies[-1] * 1000 if latencies else 0.0,
+        },
+        "queries_per_request": queries / total if total else 0.0,
+    }
+
+# Turns the raw latencies for one scenario into the numbers we report
+
+
+def run_client(app, make_request, requests, counter):
+    client = app.test_client()
+    latencies = []
+    errors = 0
+    queries_before = counter.count
+    started = time.perf_counter()
+    for i in range(requests):
+        method, path, body = make_request()
+        start = time.perf_counter()
+        response = client.open(path, method=method, json=body)
+        latencies.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            errors += 1
+    return summarize(latencies, errors, time.perf_counter() - started, counter.count - queries_before)
+
+# Sends every request for one scenario through the Flask test client one after another, which measures the app itself without any network in the way
+
+
+def run_http(base_url, make_request, requests, threads, counter):
+    lock = threading.Lock()
+    latencies = []
+    errors = [0]
+
+    def send(i):
+        with lock:
+            method, path, body = make_request()
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(base_url + path, data=data, method=method, headers={"Content-Type": "application/json"})
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+        except Exception:
+            with lock:
+                errors[0] += 1
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+
+    queries_before = counter.count
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(send, range(requests)))
+    return summarize(latencies, errors[0], time.perf_counter() - started, counter.count - queries_before)
+
+# Sends every request for one scenario over HTTP from a pool of threads at once, which shows how the app holds up under concurrent load
+
+
+def run(args):
+    database_url = benchmark_database_url(args, 'benchmark')
+    app = create_app({"SQLALCHEMY_DATABASE_URI": database_url})
+    counter = QueryCounter()
+    with app.app_context():
+        if args.reuse and db.session.execute(select(func.count()).select_from(Customer)).scalar():
+            counts = {"customers": db.session.execute(select(func.count()).select_from(Customer)).scalar(),
+                      "products": db.session.execute(select(func.count()).select_from(Product)).scalar(),
+                      "orders": db.session.execute(select(func.count()).select_from(Order)).scalar()}
+        else:
+            seed(args.customers, args.products, args.orders, args.items, args.seed)
+            counts = {"customers": args.customers, "products": args.products, "orders": args.orders}
+        counts['items'] = args.items
+        event.listen(db.engine, 'before_cursor_execute', counter)
+
+    rng = random.Random(args.seed)
+    selected = scenarios(counts, rng)
+    if args.scenarios:
+        selected = {name: selected[name] for name in args.scenarios.split(',')}
+
+    report = {"config": report_config(database_url, **counts, requests=args.requests, threads=args.threads, seed=args.seed),
+              "results": {}}
+    if args.mode in ('client', 'both'):
+        report['results']['client'] = {name: run_client(app, make_request, args.requests, counter) for name, make_request in selected.items()}
+    if args.mode in ('http', 'both'):
+        server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            base_url = f"http://127.0.0.1:{server.server_port}"
+            report['results']['http'] = {name: run_http(base_url, make_request, args.requests, args.threads, counter) for name, make_request in selected.items()}
+        finally:
+            server.shutdown()
+    return report
+
+'''
+Runs the whole benchmark: seeds the database (or reuses it with --reuse), then runs each scenario through the test client, over HTTP, or both, and returns the report.
+The query counter is only hooked on after seeding so queries_per_request only counts what the routes themselves ran.
+'''
+
+
+def compare(before_path, after_path):
+    with open(before_path) as before_file, open(after_path) as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+    print(f"{'scenario':<28}{'rps':>22}{'p50 ms':>22}{'p95 ms':>22}{'p99 ms':>22}{'queries/req':>18}")
+    for mode, results in after['results'].items():
+        for name, result in results.items():
+            old = before['results'].get(mode, {}).get(name)
+            if old is None:
+                continue
+            cells = []
+            for new_value, old_value in (
+                (result['throughput_rps'], old['throughput_rps']),
+                (result['latency_ms']['p50'], old['latency_ms']['p50']),
+                (result['latency_ms']['p95'], old['latency_ms']['p95']),
+                (result['latency_ms']['p99'], old['latency_ms']['p99']),
+            ):
+                change = (new_value - old_value) / old_value * 100 if old_value else 0.0
+                cells.append(f"{old_value:.1f} -> {new_value:.1f} ({change:+.0f}%)".rjust(22))
+            cells.append(f"{old['queries_per_request']:.1f} -> {result['queries_per_request']:.1f}".rjust(18))
+            print(f"{mode + '/' + name:<28}" + "".join(cells))
+
+# Prints how each scenario changed between two saved reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the E-Commerce API's hot endpoints")
+    add_database_argument(parser)
+    parser.add_argument('--customers', type=int, default=1000)
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--items', type=int, default=5, help="products per seeded and placed order")
+    parser.add_argument('--requests', type=int, default=500, help="requests sent per scenario")
+    parser.add_argument('--threads', type=int, default=8, help="concurrent clients in http mode")
+    parser.add_argument('--mode', choices=['client', 'http', 'both'], default='both')
+    parser.add_argument('--scenarios', help="comma separated scenarios to run, defaults to all of them")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reuse', action='store_true', help="keep the data already in the database instead of reseeding")
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help="compare two saved reports instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(report + "\n")
+    else:
+        print(report)
+
+# Command line entry point, see the usage at the top of this file
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import datetime
+import os
+import random
+import tempfile
+from decimal import Decimal
+from sqlalchemy import insert
+from sqlalchemy.engine import make_url
+from extensions import db
+from models import Customer, Product, Order, order_detail, price_snapshot
+from summaries import rebuild_customer_summaries
+
+SEED_BATCH_SIZE = 5000
+ORDER_STATUSES = ["pending", "shipped", "delivered", "cancelled"]
+PRODUCT_TYPES = ["book", "electronics", "clothing", "toy", "grocery", "garden"]
+
+# Imports our models and sets how many rows are inserted per statement while seeding, along with the values used for order statuses and product types
+
+def add_database_argument(parser):
+    parser.add_argument('--database-url', help="database to seed and benchmark (every table in it is dropped first), defaults to a SQLite file in the temp directory")
+
+def benchmark_database_url(args, name):
+    return args.database_url or f"sqlite:///{os.path.join(tempfile.gettempdir(), f'e_commerce_{name}.db')}"
+
+'''
+Every benchmark seeds its database from scratch, which drops all of its tables, so it only ever runs against a database named on the command line with --database-url
+(for example a throwaway MySQL schema) and otherwise uses its own SQLite file in the temp directory. DATABASE_URL is deliberately ignored, since config.py loads it
+from .env and it usually points at the database we actually use.
+'''
+
+def report_config(database_url, args=None, **settings):
+    if args is not None:
+        settings.update((key, value) for key, value in vars(args).items() if key not in ('database_url', 'output'))
+    return {"database": make_url(database_url).render_as_string(hide_password=True), **settings}
+
+# The config section at the top of every benchmark report, the database without its password plus the settings of the run (every command line option when args is passed)
+
+def insert_batches(table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == SEED_BATCH_SIZE:
+            db.session.execute(insert(table), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(table), batch)
+    db.session.commit()
+
+# Inserts rows from a generator SEED_BATCH_SIZE at a time so seeding large volumes never holds every row in memory
+
+def seed(customers, products, orders, items_per_order, seed_value=42):
+    rng = random.Random(seed_value)
+    db.drop_all()
+    db.create_all()
+
+    insert_batches(Customer.__table__, ({"name": f"Customer {i}", "email": f"customer{i}@example.com", "phone": f"555-{i:07d}"} for i in range(1, customers + 1)))
+    prices = [price_snapshot(round(rng.uniform(1, 500), 2)) for i in range(products)]
+    insert_batches(Product.__table__, ({"name": f"Product {i}", "product_type": rng.choice(PRODUCT_TYPES), "price": prices[i - 1]} for i in range(1, products + 1)))
+
+    start_date = datetime.date(2020, 1, 1)
+    order_items = [rng.sample(range(1, products + 1), min(items_per_order, products)) for i in range(orders)]
+    insert_batches(Order.__table__, ({
+        "order_id": order_id,
+        "customer_id": rng.randint(1, customers),
+        "date": start_date + datetime.timedelta(days=rng.randint(0, 1500)),
+        "order_status": rng.choice(ORDER_STATUSES),
+        "total_price": sum((prices[product_id - 1] for product_id in order_items[order_id - 1]), Decimal('0.00')),
+    } for order_id in range(1, orders + 1)))
+    insert_batches(order_detail, ({"order_id": order_id, "product_id": product_id, "quantity": 1, "unit_price": prices[product_id - 1]} for order_id in range(1, orders + 1) for product_id in order_items[order_id - 1]))
+    rebuild_customer_summaries()
+
+'''
+Recreates every table and fills it with made up customers, products and orders, each order getting items_per_order different products. The same seed_value always
+produces the same data so runs against different versions of the code can be compared fairly. Customer order summaries are rebuilt at the end since the orders
+are inserted directly instead of through our routes.
+'''
@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from app import create_app
+from extensions import db
+from models import Product, Order
+from schemas import products_schema, orders_schema
+from serializers import product_serializer, order_serializer, OrjsonProvider
+from benchmarks.seed import seed
+
+'''
+Micro-benchmark comparing marshmallow's jsonify with the fast serializers in serializers.py on the product and order listings. Each case loads a listing from a seeded
+SQLite database and encodes it into the response body, and the fast path's body is checked to be byte-identical to marshmallow's before any timing is reported.
+
+    python -m benchmarks.serialization --products 10000 --orders 5000 --items 5
+'''
+
+
+def best_of(repeat, func):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+# Runs func repeat times and returns the fastest run, which is the least affected by noise from the rest of the machine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare marshmallow and the fast serializers")
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--items', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    database_url = f"sqlite:///{os.path.join(tempfile.gettempdir(), 'e_commerce_serialization.db')}"
+    app = create_app({"SQLALCHEMY_DATABASE_URI": database_url, "METRICS_ENABLED": False})
+    orjson_provider = OrjsonProvider(app)
+    results = {}
+    with app.test_request_context():
+        seed(customers=100, products=args.products, orders=args.orders, items_per_order=args.items)
+        cases = {
+            "products": (
+                lambda: app.json.response(products_schema.dump(db.session.execute(select(Product).order_by(Product.product_id)).scalars().all())),
+                lambda: product_serializer.dump(product_serializer.fetch(product_serializer.select().order_by(Product.product_id))),
+            ),
+            "orders": (
+                lambda: app.json.response(orders_schema.dump(db.session.execute(select(Order).options(selectinload(Order.items)).order_by(Order.order_id)).scalars().all())),
+                lambda: order_serializer.dump(order_serializer.fetch(order_serializer.select([selectinload(Order.items)]).order_by(Order.order_id))),
+            ),
+        }
+        for name, (marshmallow_case, fast_items) in cases.items():
+            db.session.expunge_all()
+            expected = marshmallow_case().get_data()
+            db.session.expunge_all()
+            actual = app.json.response(fast_items()).get_data()
+            if actual != expected:
+                raise SystemExit(f"{name}: fast serializer output differs from marshmallow")
+
+            def fresh(func):
+                def run():
+                    db.session.expunge_all()
+                    return func()
+                return run
+
+            marshmallow_seconds = best_of(args.repeat, fresh(marshmallow_case))
+            fast_seconds = best_of(args.repeat, fresh(lambda: app.json.response(fast_items())))
+            orjson_seconds = best_of(args.repeat, fresh(lambda: orjson_provider.response(fast_items())))
+            results[name] = {
+                "rows": args.products if name == "products" else args.orders,
+                "body_bytes": len(expected),
+                "identical_output": True,
+                "marshmallow_ms": marshmallow_seconds * 1000,
+                "fast_ms": fast_seconds * 1000,
+                "fast_orjson_ms": orjson_seconds * 1000,
+                "speedup": marshmallow_seconds / fast_seconds,
+                "speedup_orjson": marshmallow_seconds / orjson_seconds,
+            }
+    print(json.dumps(results, indent=2))
+
+'''
+Seeds the database, checks that the fast serializer produces exactly the same response body as marshmallow for each listing, and then times loading and encoding the
+whole listing three ways: marshmallow with Flask's default JSON provider, the fast serializer with the default provider, and the fast serializer with orjson.
+'''
+
+
+if __name__ == "__main__":
+    main()
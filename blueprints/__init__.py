@@ -0,0 +1,10 @@
+from blueprints.main import main_bp
+from blueprints.customers import customers_bp
+from blueprints.accounts import accounts_bp
+from blueprints.products import products_bp
+from blueprints.orders import orders_bp
+from blueprints.order_details import order_details_bp
+
+all_blueprints = [main_bp, customers_bp, accounts_bp, products_bp, orders_bp, order_details_bp]
+
+# Collects the blueprints for each part of our API so create_app can register them all
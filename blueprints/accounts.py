@@ -0,0 +1,76 @@
+from flask import Blueprint, jsonify, request
+from marshmallow import ValidationError
+from extensions import db
+from models import Customer, CustomerAccount
+from schemas import customer_account_schema
+from pagination import list_rows
+from serializers import customer_account_serializer
+from hashing import HashingBusy
+
+accounts_bp = Blueprint('accounts', __name__)
+
+# Blueprint for all of our /accounts routes
+
+@accounts_bp.route('/accounts', methods=['POST'])
+def add_customer_account():
+    try:
+        account_data = customer_account_schema.load(request.json)
+    except ValidationError as err:
+        return jsonify(err.messages),400
+    
+    new_account = CustomerAccount(username=account_data['username'], customer_id=account_data['customer_id'])
+    try:
+        new_account.set_password(account_data['password'])
+    except HashingBusy:
+        return jsonify({"Error": "Too many passwords being set right now, try again shortly"}), 503, {"Retry-After": "1"}
+    db.session.add(new_account)
+    db.session.commit()
+    return jsonify({"message": "new customer account added successfully"}), 201
+
+# Loads information in from POSTMAN and if there is no validation error creates a new account by instantiating a row with the CustomerAccount class. Add's thi row to the database, commits the change, and then returns a 201 success message.
+# The password is hashed in the password hasher's worker processes, and if it is already as busy as it is allowed to get we return a 503 instead of waiting.
+
+@accounts_bp.route('/accounts', methods=['GET'])
+def get_customer_accounts():
+    return list_rows(CustomerAccount.account_id, customer_account_serializer)
+
+# Returns a page of customer accounts ordered by account_id with a JSON 200 success message. Paging and streaming work the same as for customers.
+
+@accounts_bp.route('/accounts/<int:id>', methods=["GET"])
+def get_customer_account(id):
+    customer_accounts = customer_account_serializer.fetch(customer_account_serializer.select().where(CustomerAccount.account_id == id))
+    if customer_accounts:
+        return jsonify(customer_account_serializer.dump(customer_accounts)[0]), 200
+    else:
+        return jsonify({"error": "Customer account not found"}), 404
+
+#  Filters for a specific customer account ID and then returns the first row that matches the filter. Once the row is located we return a 200 success message or if the id is not found a 400 validation error.
+
+@accounts_bp.route('/accounts/<int:id>', methods=["PUT"])
+def update_customer_account(id):
+    customer_account = CustomerAccount.query.get_or_404(id)
+    try:
+        customer_account_data = customer_account_schema.load(request.json)
+    except ValidationError as err:
+        return jsonify(err.messages), 400
+    
+    try:
+        customer_account.set_password(customer_account_data['password'])
+    except HashingBusy:
+        return jsonify({"Error": "Too many passwords being set right now, try again shortly"}), 503, {"Retry-After": "1"}
+    customer_account.username = customer_account_data['username']
+    customer_account.customer_id = customer_account_data['customer_id']
+    db.session.commit()
+    return jsonify({"message": "account details updated successfully"}), 200
+
+# Uses same logic as Update Customer to load in changes from POSTMAN at a specific customer_account_id and then assigns these values to the appropriate location the table before comitting the update.
+# The new password is hashed the same way as when the account was created, instead of being stored as plain text.
+
+@accounts_bp.route('/accounts/<int:id>', methods=['DELETE'])
+def delete_customer_account(id):
+    customer_account = Customer.query.get_or_404(id)
+    db.session.delete(customer_account)
+    db.session.commit()
+    return jsonify({"message": "customer account removed successfully"}), 200
+
+#Uses same logic as earlier delete customer method to locate a customer account, delete it and commit the change
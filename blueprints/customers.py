@@ -0,0 +1,111 @@
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from marshmallow import ValidationError
+from extensions import db
+from models import Customer, CustomerOrderSummary, Order
+from schemas import customer_schema, bulk_customers_schema, customer_order_summary_schema, order_filter_schema
+from pagination import list_rows
+from serializers import customer_serializer, order_serializer
+from bulk import bulk_load, upsert_rows
+from conditional import conditional_response, last_modified, is_conditional
+from blueprints.orders import order_filter_clauses
+
+customers_bp = Blueprint('customers', __name__)
+
+# Blueprint for all of our /customers routes
+
+@customers_bp.route('/customers', methods=['POST'])
+def add_customer():
+    try:
+        customer_data = customer_schema.load(request.json)
+    except ValidationError as err:
+        return jsonify(err.messages),400
+    
+    new_customer = Customer(name=customer_data['name'], email=customer_data['email'], phone=customer_data['phone'])
+    db.session.add(new_customer)
+    db.session.commit()
+    return jsonify({"message": "new customer added successfully"}), 201
+
+'''
+Add's customer  by loading in our information from postman and then feeding it into our Customer class configuration, then adds and commits the change. 
+Handles 400 validation errors or returns a 201 success JSON message
+'''
+@customers_bp.route('/customers/bulk', methods=['POST'])
+def add_customers_bulk():
+    return bulk_load(bulk_customers_schema, lambda rows: upsert_rows(Customer, 'customer_id', rows))
+
+# Adds many customers at once from a JSON array or NDJSON body, rows that include a customer_id update that customer instead. Returns the number of rows written and an error for each row that was not.
+
+@customers_bp.route('/customers', methods=['GET'])
+def get_customers():
+    return list_rows(Customer.customer_id, customer_serializer, cache_control=current_app.config['CUSTOMER_CACHE_CONTROL'])
+
+#Returns a page of customers ordered by customer_id, use ?after= with the last customer_id seen to get the next page or ?format=ndjson to stream them all. Pages have ETags like the product listing
+
+@customers_bp.route('/customers/<int:id>', methods=["GET"])
+def get_customer(id):
+    if is_conditional():
+        updated_at = db.session.execute(select(Customer.updated_at).where(Customer.customer_id == id)).scalar()
+        if updated_at is None:
+            return jsonify({"error": "Customer not found"}), 404
+        stamp = updated_at.isoformat()
+        build = lambda: jsonify(customer_serializer.dump(customer_serializer.fetch(customer_serializer.select().where(Customer.customer_id == id)))[0])
+    else:
+        customers = customer_serializer.fetch(customer_serializer.select().where(Customer.customer_id == id))
+        if not customers:
+            return jsonify({"error": "Customer not found"}), 404
+        customer = customer_serializer.dump(customers)[0]
+        stamp = customer['updated_at']
+        build = lambda: jsonify(customer)
+    return conditional_response(f"customer-{id}-{stamp}", current_app.config['CUSTOMER_CACHE_CONTROL'], build, modified=last_modified(stamp))
+
+# Uses an integer at the end of our URL to define specific customer we will filter our query for. Then either returns this customers information with a 200 success message or handles a 400 error.
+# Sends an ETag and Last-Modified from the customer's updated_at and returns an empty 304 when the client's copy is still current. For a conditional request only
+# updated_at is read first, so a 304 never loads or dumps the rest of the row.
+
+@customers_bp.route('/customers/<int:id>/orders', methods=["GET"])
+def get_customer_orders(id):
+    if db.session.get(Customer, id) is None:
+        return jsonify({"error": "Customer not found"}), 404
+    return list_rows(Order.order_id, order_serializer, options=[selectinload(Order.items)], filter_schema=order_filter_schema, filter_clauses=order_filter_clauses,
+                     where=[Order.customer_id == id])
+
+# Returns a page of one customer's orders with their lines, paging and the ?status=, ?date_from= and ?date_to= filters work the same as GET /orders. Returns a 404 if the customer does not exist.
+
+@customers_bp.route('/customers/<int:id>/summary', methods=["GET"])
+def get_customer_summary(id):
+    if db.session.get(Customer, id) is None:
+        return jsonify({"error": "Customer not found"}), 404
+    summary = db.session.get(CustomerOrderSummary, id) or CustomerOrderSummary(customer_id=id, order_count=0, lifetime_spend=0)
+    return customer_order_summary_schema.jsonify(summary), 200
+
+# Returns the customer's order count, lifetime spend and latest order date from the precomputed summary table, customers with no orders yet get zeros
+
+@customers_bp.route('/customers/<int:id>', methods=["PUT"])
+def update_customer(id):
+    customer = Customer.query.get_or_404(id)
+    try:
+        customer_data = customer_schema.load(request.json)
+    except ValidationError as err:
+        return jsonify(err.messages), 400
+    
+    customer.name = customer_data['name']
+    customer.email = customer_data['email']
+    customer.phone = customer_data['phone']
+    db.session.commit()
+    return jsonify({"message": "Customer details updated successfully"}), 200
+
+'''
+Uses integer in URL to find a customer ID and then queries for that customer ID. We then try to create the variable of customer_data with
+what is entered and loaded in from POSTMAN. Handles any 400 validation errors, and if not then proceeds to assign our values from customer_data into the appropriate columns of our database.
+Lastly it commits the update and returns a 200 success JSON message 
+'''
+@customers_bp.route('/customers/<int:id>', methods=['DELETE'])
+def delete_customer(id):
+    customer = Customer.query.get_or_404(id)
+    db.session.delete(customer)
+    db.session.commit()
+    return jsonify({"message": "Customer removed successfully"}), 200
+
+# Querries for the Customer_id found in the URL and then returns that customer or a 404 message. If a customer is returned we delete the customer from our table, commit, the change, and return a 200 success message.
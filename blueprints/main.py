@@ -0,0 +1,61 @@
+from flask import Blueprint, current_app, jsonify, Response
+from extensions import db
+from cache import get_catalog_cache
+from metrics import gauge
+from pooling import pool_stats
+from order_pipeline import get_order_pipeline
+from hashing import get_password_hasher
+
+main_bp = Blueprint('main', __name__)
+
+# Blueprint for our homepage and the stats endpoints that are not tied to one table
+
+@main_bp.route('/')
+def home():
+    return "E-Commerce Database"
+
+#API Homepage
+
+@main_bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify(get_catalog_cache().stats()), 200
+
+# Returns the catalog cache's hit and miss counters for this worker along with its backend, number of entries and TTL
+
+@main_bp.route('/pool/stats', methods=['GET'])
+def get_pool_stats():
+    return jsonify(pool_stats(db.engine)), 200
+
+# Returns how many database connections this worker has checked out, idle and in overflow, along with how long requests have waited to get one
+
+@main_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    metrics = current_app.extensions.get('metrics')
+    if metrics is None:
+        return jsonify({"error": "Metrics are turned off"}), 404
+
+    pool = pool_stats(db.engine)
+    cache = get_catalog_cache().stats()
+    extra_lines = []
+    for name, key, help_text in (
+        ('db_pool_checked_out', 'checked_out', 'Database connections currently in use.'),
+        ('db_pool_overflow', 'overflow', 'Connections open beyond pool_size.'),
+        ('db_pool_checkout_wait_seconds_total', 'wait_total_seconds', 'Total time spent waiting for a connection.'),
+    ):
+        if key in pool:
+            extra_lines.extend(gauge(name, help_text, pool[key]))
+    extra_lines.extend(gauge('catalog_cache_hits_total', 'Catalog cache hits.', cache['hits']))
+    extra_lines.extend(gauge('catalog_cache_misses_total', 'Catalog cache misses.', cache['misses']))
+    pipeline = get_order_pipeline()
+    if pipeline is not None:
+        stats = pipeline.stats()
+        extra_lines.extend(gauge('order_pipeline_queued', 'Orders waiting to be written by the order pipeline.', stats['queued']))
+        extra_lines.extend(gauge('order_pipeline_committed_total', 'Orders committed by the order pipeline.', stats['committed']))
+        extra_lines.extend(gauge('order_pipeline_failed_total', 'Orders the order pipeline could not write.', stats['failed']))
+    extra_lines.extend(get_password_hasher().metric_lines())
+    for limiter in (current_app.extensions.get('rate_limiter'), current_app.extensions.get('concurrency_limiter')):
+        if limiter is not None:
+            extra_lines.extend(limiter.metric_lines())
+    return Response(metrics.render(extra_lines), mimetype='text/plain; version=0.0.4')
+
+# Returns this worker's request, query and serialization metrics in the Prometheus text format along with the connection pool, catalog cache, order pipeline, password hashing and admission control numbers
@@ -0,0 +1,77 @@
+from flask import Blueprint, jsonify, request
+from sqlalchemy import select
+from marshmallow import ValidationError
+from extensions import db
+from models import OrderItem, Product, order_detail, price_snapshot
+from schemas import order_detail_schema, order_details_schema
+from bulk import bulk_load, upsert_statement
+from summaries import refresh_order_totals
+from order_items import change_order_items, lock_orders
+
+order_details_bp = Blueprint('order_details', __name__)
+
+# Blueprint for all of our /order_details routes
+
+def check_order_detail_rows(good, errors):
+    order_ids = {row['order_id'] for index, row in good}
+    product_ids = {row['product_id'] for index, row in good}
+    found_orders = lock_orders(order_ids)
+    prices = dict(db.session.execute(select(Product.product_id, Product.price).where(Product.product_id.in_(product_ids))).all())
+    checked = []
+    for index, row in good:
+        if row['order_id'] in found_orders and row['product_id'] in prices:
+            row['unit_price'] = price_snapshot(prices[row['product_id']])
+            checked.append((index, row))
+        else:
+            errors.append({"index": index, "errors": {"_schema": ["Order or Product not found"]}})
+    return checked
+
+# Looks up every order and product referenced in a bulk batch with one IN query each and reports rows pointing at either one that does not exist. Good rows get the product's current price as their unit price
+# The orders are locked as they are looked up, before anything else in the batch's transaction is read, so a PATCH /orders/<id>/items on one of them waits for the batch or the batch waits for it
+
+def write_order_detail_rows(rows):
+    db.session.execute(upsert_statement(order_detail, []), rows)
+    refresh_order_totals({row['order_id'] for row in rows})
+
+# Inserts a batch of order details, skipping lines already in the table, then recomputes the totals of the orders they were added to
+
+@order_details_bp.route('/order_details', methods=['POST'])
+def add_order_detail():
+    try:
+        order_detail_data = order_detail_schema.load(request.json)
+    except ValidationError as err:
+        return jsonify(err.messages), 400
+
+    error = change_order_items(order_detail_data['order_id'], add={order_detail_data['product_id']: order_detail_data['quantity']})
+    if error:
+        db.session.rollback()
+        return jsonify({"error": error}), 404
+    db.session.commit()
+    return jsonify({"message": "Order detail added successfully"}), 201
+
+#Adds to order detail by loading information from request and saves to OrderDetail table. Handles error validation and checks for order and product to exist prior to adding.
+#Adding a product that is already on the order just adds to its quantity, then the order total and the customer's lifetime spend are updated in the same transaction with the order locked, see change_order_items.
+
+@order_details_bp.route('/order_details/bulk', methods=['POST'])
+def add_order_details_bulk():
+    return bulk_load(order_details_schema, write_order_detail_rows, check_rows=check_order_detail_rows)
+
+# Adds many order details at once using the same logic as bulk customers. Rows pointing at an order or product that does not exist are reported as errors and rows already in the table are skipped.
+
+@order_details_bp.route('/order_details', methods=['GET'])
+def get_order_details():
+    order_details = db.session.execute(select(OrderItem)).scalars().all()
+    return order_details_schema.jsonify(order_details), 200
+
+#Queries and returns everything in order details table
+
+@order_details_bp.route('/order_details/<int:order_id>/<int:product_id>', methods=['DELETE'])
+def delete_order_detail(order_id, product_id):
+    error = change_order_items(order_id, remove=[product_id])
+    if error:
+        db.session.rollback()
+        return jsonify({"error": error}), 404
+    db.session.commit()
+    return jsonify({"message": "Order detail removed successfully"}), 200
+
+#Deletes order detail based on order id and product id provided in URL with a single DELETE, then updates the order total and the customer's lifetime spend
@@ -0,0 +1,241 @@
+import logging
+import queue
+from collections import Counter
+from flask import Blueprint, Response, jsonify, request, stream_with_context, url_for
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, selectinload
+from marshmallow import ValidationError
+from extensions import db
+from models import Order, OrderItem, price_snapshot
+from schemas import order_schema, order_items_schema, order_items_change_schema, order_filter_schema, order_export_schema
+from pagination import list_rows
+from serializers import order_serializer
+from cache import get_catalog_cache
+from summaries import record_order_change
+from order_pipeline import write_orders, get_order_pipeline
+from exports import EXPORT_MIMETYPES, export_orders, last_order_id
+from order_items import change_order_items, lock_order
+from blueprints.products import load_product_dicts
+
+orders_bp = Blueprint('orders', __name__)
+logger = logging.getLogger(__name__)
+
+# Blueprint for all of our /orders routes
+
+def order_filter_clauses(filters):
+    clauses = []
+    if 'customer_id' in filters:
+        clauses.append(Order.customer_id == filters['customer_id'])
+    if 'order_status' in filters:
+        clauses.append(Order.order_status == filters['order_status'])
+    if 'date_from' in filters:
+        clauses.append(Order.date >= filters['date_from'])
+    if 'date_to' in filters:
+        clauses.append(Order.date <= filters['date_to'])
+    return clauses
+
+# Turns the filters from GET /orders into WHERE clauses, both ends of the date range are inclusive
+
+def read_order_quantities(json_order):
+    product_ids = json_order.pop('products', None)
+    items = json_order.pop('items', None)
+    if items is not None:
+        quantities = {}
+        for item in order_items_schema.load(items):
+            quantities[item['product_id']] = quantities.get(item['product_id'], 0) + item['quantity']
+    elif not product_ids:
+        quantities = {}
+    elif not isinstance(product_ids, list) or not all(isinstance(product_id, int) for product_id in product_ids):
+        return None, "products must be a list of product IDs"
+    else:
+        quantities = dict(Counter(product_ids))
+
+    if not quantities:
+        return None, "Cannot place an order without products"
+    return quantities, None
+
+'''
+Reads which products an order is for and how many of each from either items, a list of {"product_id": 1, "quantity": 2} lines, or products, a plain list of product IDs
+where listing a product twice buys two of it. Returns a dict of product_id to quantity, or an error message when the order has no products or products is not a list
+of IDs. Invalid items raise a ValidationError just like the rest of the order.
+'''
+
+@orders_bp.route('/orders', methods=['POST'])
+def place_order():
+    try:
+        json_order = request.json
+
+        # Validate product IDs and quantities
+        quantities, error = read_order_quantities(json_order)
+        logger.debug("Placing order for products %s", quantities)
+        if error:
+            return jsonify({"Error": error}), 400
+
+        # load and validate order data
+        order_data = order_schema.load(json_order, partial=True)
+    except ValidationError as err:
+        return jsonify(err.messages), 400
+
+    # look up every product through the catalog cache, loading any misses in one query
+    products = get_catalog_cache().get_products(list(quantities), load_product_dicts)
+    missing_products = [product_id for product_id in quantities if product_id not in products]
+    if missing_products:
+        return jsonify({"Error": f"Product with ID {missing_products} not found"}), 404
+
+    order = {"customer_id": order_data['customer_id'], "date": order_data['date'], "order_status": order_data['order_status'],
+             "items": quantities, "prices": {product_id: price_snapshot(products[product_id]['price']) for product_id in quantities}}
+
+    pipeline = get_order_pipeline()
+    if pipeline is not None:
+        try:
+            token = pipeline.submit(order)
+        except queue.Full:
+            return jsonify({"Error": "Too many orders waiting to be placed, try again shortly"}), 503, {"Retry-After": "1"}
+        status_url = url_for('orders.get_order_status', token=token)
+        return jsonify({"message": "order accepted", "token": token, "status_url": status_url}), 202, {"Location": status_url}
+
+    # create the order with its total price, link its products in the join table and update the customer's order summary
+    write_orders([order])
+    db.session.commit()
+
+    return jsonify({"message": "new order placed successfully"}), 201
+
+'''
+In a try block we load in Order_data from postman configured into our appropriate schema. We then use read_order_quantities to pop the products or items list off our order_data and count how many of each product were ordered.
+If there are none or they are not valid we return a 400 error and if there is a validation error we return a 400 error. If not we look up all of the products through the catalog cache, which loads any it
+does not have in a single query, and if any product ID cannot be located in our product table we return a 404 error message listing every missing ID. Otherwise each product's current price is copied onto
+its line and write_orders totals up the lines, adds the order, inserts a row into the Order_Detail table for each line with one executemany and updates the customer's order summary, all in one transaction.
+Then a 201 success JSON message is returned.
+When ORDER_PIPELINE=async the validated order is handed to the order pipeline instead and we return a 202 with a token that can be checked at /orders/status/<token>, or a 503 if its queue is full.
+'''
+
+@orders_bp.route('/orders/status/<token>', methods=['GET'])
+def get_order_status(token):
+    pipeline = get_order_pipeline()
+    status = pipeline.status(token) if pipeline is not None else None
+    if status is None:
+        return jsonify({"error": "Order token not found"}), 404
+    return jsonify({"token": token, **status}), 200
+
+# Returns whether an order accepted by the async pipeline is still queued, was committed (along with its order_id) or failed (along with the error)
+
+@orders_bp.route('/orders/export', methods=['GET'])
+def export_all_orders():
+    try:
+        args = order_export_schema.load(request.args)
+    except ValidationError as err:
+        return jsonify(err.messages), 400
+
+    export_format = args.pop('format')
+    until = last_order_id()
+    response = Response(stream_with_context(export_orders(export_format, until=until, **args)), mimetype=EXPORT_MIMETYPES[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename="orders.{export_format}"'
+    response.headers['X-Last-Order-Id'] = str(until)
+    return response
+
+'''
+Streams every order line joined with its order, customer and product as CSV (the default) or NDJSON with format=ndjson, for finance to pull everything in one request
+instead of calling GET /orders/<id> per order. date_from and date_to limit it to a range of order dates and since=<order_id> only exports orders after that one.
+The export stops at the newest order that existed when the request came in, which is sent back in X-Last-Order-Id so the next incremental export can pass it as since.
+Orders from transactions that were still open at that moment can commit with a lower ID later, so incremental exports should leave a little time for writes to settle.
+'''
+
+@orders_bp.route('/orders', methods=['GET'])
+def get_all_orders():
+    return list_rows(Order.order_id, order_serializer, options=[selectinload(Order.items)], filter_schema=order_filter_schema, filter_clauses=order_filter_clauses)
+
+#Returns a page of orders ordered by order_id with a 200 success message from JSON. Paging and streaming work the same as for customers.
+#The lines for every order on the page are loaded with one extra IN query on the Order_Detail primary key instead of one query per order, and never need the Products table.
+#Can be filtered with ?customer_id=, ?status=, ?date_from= and ?date_to= (YYYY-MM-DD)
+
+@orders_bp.route('/orders/<int:id>', methods=["GET"])
+def get_order(id):
+    orders = order_serializer.fetch(order_serializer.select([joinedload(Order.items)]).where(Order.order_id == id))
+    if orders:
+        return jsonify(order_serializer.dump(orders)[0]), 200
+    else:
+        return jsonify({"error": "Order not found"}), 404
+
+#Queries specifically for the Order id entered into our URL, joining in its lines so the whole order comes back in a single query. If an order is located a 200 success JSON message is returned, if not a 400 validation error is returned.
+
+@orders_bp.route('/orders/<int:id>', methods=["PUT"])
+def update_order(id):
+    order = db.first_or_404(select(Order).where(Order.order_id == id).with_for_update())
+    try:
+        json_order = request.json
+        quantities, error = read_order_quantities(json_order)
+        if error:
+            return jsonify({"Error": error}), 400
+        order_data = order_schema.load(json_order, partial=True)
+    except ValidationError as err:
+        return jsonify(err.messages), 400
+
+    products = get_catalog_cache().get_products(list(quantities), load_product_dicts)
+    missing_products = [product_id for product_id in quantities if product_id not in products]
+    if missing_products:
+        return jsonify({"Error": f"Product with ID {missing_products} not found"}), 404
+
+    old_customer_id, old_total_price = order.customer_id, order.total_price
+    old_prices = {item.product_id: item.unit_price for item in order.items}
+    order.customer_id = order_data['customer_id']
+    order.date = order_data['date']
+    order.order_status = order_data['order_status']
+    order.items = [OrderItem(product_id=product_id, quantity=quantity, unit_price=old_prices.get(product_id, price_snapshot(products[product_id]['price'])))
+                   for product_id, quantity in quantities.items()]
+    order.calculate_total_price()
+
+    if order.customer_id == old_customer_id:
+        record_order_change(order.customer_id, 0, order.total_price - old_total_price)
+    else:
+        record_order_change(old_customer_id, -1, -old_total_price)
+        record_order_change(order.customer_id, 1, order.total_price)
+    db.session.commit()
+    return jsonify({"message": "Order details updated successfully"}), 200
+
+'''
+First queries for the ID that is entered into the URL, locking the order row so changes to its lines from other requests wait for ours. Then using similar logic to our add_order method loads in our new data from POSTMAN and uses read_order_quantities to read the new products and quantities.
+If there are none we return a 400 error message as an order must contain a product list. We also handle any validation errors in our except block.
+Next all of the products are looked up through the catalog cache, and if any are missing we return a 404 listing every missing ID before anything on the order is changed.
+We then Assign our loaded in values to the appropriate columns for customer_id, order_date, and order_status and replace the order's lines with the new ones, which updates the Order_Detail table.
+Products that were already on the order keep the price they were originally sold at and only newly added products take the current price.
+We then recalculate the total and update the customer's order summary by the difference (or move the order from the old customer's summary to the new one's), commit all our changes and return a 200 success message.
+'''
+
+@orders_bp.route('/orders/<int:id>/items', methods=['PATCH'])
+def update_order_items(id):
+    try:
+        changes = order_items_change_schema.load(request.json)
+    except ValidationError as err:
+        return jsonify(err.messages), 400
+
+    add = {}
+    for item in changes['add']:
+        add[item['product_id']] = add.get(item['product_id'], 0) + item['quantity']
+    error = change_order_items(id, add, changes['remove'])
+    if error:
+        db.session.rollback()
+        return jsonify({"error": error}), 404
+    db.session.commit()
+
+    orders = order_serializer.fetch(order_serializer.select([joinedload(Order.items)]).where(Order.order_id == id))
+    return jsonify(order_serializer.dump(orders)[0]), 200
+
+'''
+Changes the lines on an order in one transaction, with a body like {"add": [{"product_id": 1, "quantity": 2}], "remove": [3, 4]}. Adding a product that is already on
+the order raises its quantity and a new one is added at the product's current price, and remove drops those products' lines. change_order_items locks the order first
+so parallel edits to the same order cannot lose each other's changes, and the total and the customer's order summary are updated once for the whole batch.
+If the order, a product to add or a line to remove does not exist we return a 404 and nothing is changed, otherwise the updated order is returned with a 200.
+'''
+
+@orders_bp.route('/orders/<int:id>', methods=['DELETE'])
+def delete_order(id):
+    if not lock_order(id):
+        return jsonify({"error": "Order not found"}), 404
+    order = db.session.get(Order, id)
+    db.session.delete(order)
+    record_order_change(order.customer_id, -1, -order.total_price)
+    db.session.commit()
+    return jsonify({"message": "Order removed successfully"}), 200
+
+# Locates a specific order via it's ID number and either locates the query or returns a 404. If it is located we delete that order's row from the table, take it off the customer's order summary, commit the change and return a 200 success JSON message
+# The order is locked first like PATCH /orders/<id>/items does, so a line change running at the same time cannot add to the total (and the summary) we are taking off
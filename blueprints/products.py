@@ -0,0 +1,116 @@
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from marshmallow import ValidationError
+from extensions import db
+from models import OrderItem, Product
+from schemas import product_schema, bulk_products_schema, product_filter_schema
+from pagination import list_rows
+from serializers import product_serializer
+from bulk import bulk_load, upsert_rows
+from cache import get_catalog_cache
+from conditional import conditional_response, last_modified
+
+products_bp = Blueprint('products', __name__)
+
+# Blueprint for all of our /products routes
+
+def load_product_dicts(product_ids):
+    rows = product_serializer.fetch(product_serializer.select().where(Product.product_id.in_(list(product_ids))))
+    return {product['product_id']: product for product in product_serializer.dump(rows)}
+
+# Loader used by the catalog cache to fill in any products it does not have yet, selecting just their columns in one IN query and returning them serialized and keyed by product_id
+
+def product_filter_clauses(filters):
+    clauses = []
+    if 'product_type' in filters:
+        clauses.append(Product.product_type == filters['product_type'])
+    if 'name' in filters:
+        clauses.append(Product.name.startswith(filters['name'], autoescape=True))
+    if 'min_price' in filters:
+        clauses.append(Product.price >= filters['min_price'])
+    if 'max_price' in filters:
+        clauses.append(Product.price <= filters['max_price'])
+    return clauses
+
+# Turns the filters from GET /products into WHERE clauses, the name filter matches names that start with the given text
+
+@products_bp.route('/products', methods=['POST'])
+def add_product():
+    try:
+        product_data = product_schema.load(request.json)
+    except ValidationError as err:
+        return jsonify(err.messages),400
+    
+    new_product = Product(name=product_data['name'], product_type=product_data['product_type'], price=product_data['price'])
+    db.session.add(new_product)
+    db.session.commit()
+    get_catalog_cache().invalidate()
+    return jsonify({"message": "new product added successfully"}), 201
+
+# Uses same logic as Add Customer and Add Customer Account to load in product data from POSTMAN and configure it into a table row before adding to our database and commiting the change.
+# Cached product listings are dropped afterwards so the new product shows up.
+
+@products_bp.route('/products/bulk', methods=['POST'])
+def add_products_bulk():
+    response = bulk_load(bulk_products_schema, lambda rows: upsert_rows(Product, 'product_id', rows))
+    get_catalog_cache().clear()
+    return response
+
+# Adds or updates many products at once using the same logic as bulk customers, then clears the catalog cache since any cached product may have changed.
+
+@products_bp.route('/products', methods=['GET'])
+def get_all_products():
+    return list_rows(Product.product_id, product_serializer, cache=get_catalog_cache(), filter_schema=product_filter_schema, filter_clauses=product_filter_clauses,
+                     cache_control=current_app.config['CATALOG_CACHE_CONTROL'])
+
+# Returns a page of products ordered by product_id and returns a JSON 200 success message. Paging and streaming work the same as for customers, and JSON pages are served from the catalog cache.
+# Can be filtered with ?type=, ?name= (name prefix), ?min_price= and ?max_price=, and every page has an ETag so unchanged pages come back as an empty 304
+
+@products_bp.route('/products/<int:id>', methods=["GET"])
+def get_product(id):
+    product = get_catalog_cache().get_product(id, lambda: load_product_dicts([id]).get(id))
+    if product:
+        etag = f"product-{id}-{product['updated_at']}"
+        return conditional_response(etag, current_app.config['CATALOG_CACHE_CONTROL'], lambda: jsonify(product), modified=last_modified(product['updated_at']))
+    else:
+        return jsonify({"error": "Product not found"}), 404
+
+# Uses same logic as earlier Customer and Customer Account methods to locate a specific product ID and return all of its details, going through the catalog cache so repeat reads skip the database.
+# The ETag and Last-Modified come from the product's updated_at, so a client that already has this version gets an empty 304 back.
+
+@products_bp.route('/products/<int:id>', methods=["PUT"])
+def update_product(id):
+    product = Product.query.get_or_404(id)
+    try:
+        product_data = product_schema.load(request.json)
+    except ValidationError as err:
+        return jsonify(err.messages), 400
+    
+    product.name = product_data['name']
+    product.product_type = product_data['product_type']
+    product.price = product_data['price']
+    db.session.commit()
+    get_catalog_cache().invalidate(id)
+    return jsonify({"message": "product details updated successfully"}), 200
+
+# Uses same logic as earlier PUT methods to intake data from POSTMAN for a specific product ID that is identified in the URL. Configures new values from POSTMAN into the appropriate columns and then commits the update.
+# The product and any cached listings are then dropped from the catalog cache.
+
+@products_bp.route('/products/<int:id>', methods=['DELETE'])
+def delete_product(id):
+    product = Product.query.get_or_404(id)
+    if db.session.execute(select(OrderItem.order_id).where(OrderItem.product_id == id).limit(1)).first() is not None:
+        return jsonify({"error": "Product is on existing orders and cannot be deleted"}), 409
+    db.session.delete(product)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "Product is on existing orders and cannot be deleted"}), 409
+    get_catalog_cache().invalidate(id)
+    return jsonify({"message": "product removed successfully"}), 200
+
+# Locates a specific product via it's ID and using the same logic from earlier delete methods locates that product's row, deletes it, and commits the change before dropping it from the catalog cache.
+# A product that is still on an order is kept and a 409 is returned instead, since its order lines point at it. The IntegrityError covers an order that picks the product up
+# between our check and the commit.
@@ -0,0 +1,135 @@
+import json
+from flask import current_app, jsonify, request
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from marshmallow import ValidationError
+from extensions import db
+from models import utcnow
+from schemas import bulk_args_schema
+
+INVALID_JSON = object()
+
+# Imports what our bulk endpoints share, INVALID_JSON marks NDJSON lines that could not be parsed
+
+def read_ndjson(stream):
+    for line in stream:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield INVALID_JSON
+
+# Reads a request body one line at a time so large NDJSON uploads never have to be held in memory, lines that are not valid JSON are passed on as INVALID_JSON
+
+def bulk_load(schema, write_rows, check_rows=None):
+    try:
+        args = bulk_args_schema.load(request.args)
+    except ValidationError as err:
+        return jsonify(err.messages), 400
+    batch_size = args.get('batch_size', current_app.config['BULK_BATCH_SIZE'])
+
+    if request.mimetype == 'application/x-ndjson':
+        rows = read_ndjson(request.stream)
+    else:
+        rows = request.get_json()
+        if not isinstance(rows, list):
+            return jsonify({"error": "Expected a JSON array or NDJSON rows"}), 400
+
+    processed = 0
+    errors = []
+    batch = []
+    for index, row in enumerate(rows):
+        batch.append((index, row))
+        if len(batch) == batch_size:
+            processed += write_bulk_batch(batch, schema, write_rows, check_rows, errors)
+            batch = []
+    if batch:
+        processed += write_bulk_batch(batch, schema, write_rows, check_rows, errors)
+
+    return jsonify({"processed": processed, "errors": errors}), 207 if errors else 201
+
+'''
+Shared by all of our bulk endpoints. Accepts either a JSON array or an NDJSON body and works through it batch_size rows at a time (BULK_BATCH_SIZE unless the request
+asks for another size), so only one batch is ever validated and written at once. Rows that fail are reported back by their position in the upload instead of failing
+the whole request, returning 201 when every row was written or 207 along with the list of errors when some were not.
+'''
+
+def write_bulk_batch(batch, schema, write_rows, check_rows, errors):
+    indexes = [index for index, row in batch]
+    rows = [{} if row is INVALID_JSON else row for index, row in batch]
+    try:
+        loaded = schema.load(rows)
+        invalid = {}
+    except ValidationError as err:
+        loaded = err.valid_data
+        invalid = err.messages
+
+    good = []
+    for position, index in enumerate(indexes):
+        if batch[position][1] is INVALID_JSON:
+            errors.append({"index": index, "errors": {"_schema": ["Invalid JSON."]}})
+        elif position in invalid:
+            errors.append({"index": index, "errors": invalid[position]})
+        else:
+            good.append((index, loaded[position]))
+    if check_rows and good:
+        good = check_rows(good, errors)
+
+    processed = 0
+    try:
+        with db.session.begin_nested():
+            write_rows([row for index, row in good])
+        processed = len(good)
+    except SQLAlchemyError:
+        for index, row in good:
+            try:
+                with db.session.begin_nested():
+                    write_rows([row])
+                processed += 1
+            except SQLAlchemyError as err:
+                errors.append({"index": index, "errors": {"_schema": [str(getattr(err, 'orig', err))]}})
+    db.session.commit()
+    return processed
+
+'''
+Validates one batch with the many-mode schema and records an error for every row that did not pass, then runs check_rows if the endpoint has extra checks to make.
+The remaining rows are written together inside a savepoint, and if the database rejects the batch it is retried one row at a time so only the bad rows are reported.
+Each batch is committed on its own so a long upload does not hold one huge transaction open.
+'''
+
+def upsert_statement(table, update_columns, update_values=None):
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(table)
+        if not update_columns and not update_values:
+            update_columns = [column.name for column in table.primary_key]
+        return stmt.on_duplicate_key_update({**{column: stmt.inserted[column] for column in update_columns}, **(update_values or {})})
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        stmt = sqlite_insert(table)
+        if not update_columns and not update_values:
+            return stmt.on_conflict_do_nothing()
+        return stmt.on_conflict_do_update(index_elements=list(table.primary_key), set_={**{column: stmt.excluded[column] for column in update_columns}, **(update_values or {})})
+    return insert(table)
+
+'''
+Builds an INSERT that updates the existing row when the primary key is already taken, using ON DUPLICATE KEY UPDATE on MySQL and ON CONFLICT on SQLite.
+update_columns are copied from the new row, and update_values can set columns to any other SQL expression instead (like adding to a counter).
+The dialect modules are imported here rather than at the top so workers only load the one they actually use.
+'''
+
+def upsert_rows(model, key, rows):
+    table = model.__table__
+    new_rows = [row for row in rows if key not in row]
+    existing_rows = [row for row in rows if key in row]
+    if new_rows:
+        db.session.execute(insert(table), new_rows)
+    if existing_rows:
+        update_columns = [column for column in existing_rows[0] if column != key]
+        update_values = {"updated_at": utcnow()} if 'updated_at' in table.c else None
+        db.session.execute(upsert_statement(table, update_columns, update_values), existing_rows)
+
+# Writes a batch of rows with executemany, plain INSERTs for rows without an ID and upserts for rows that have one.
+# Upserts skip the columns' onupdate, so updated_at is set here for tables that have it
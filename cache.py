@@ -0,0 +1,188 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+
+# Imports the modules needed for our in-process cache, json is only used when values are stored in Redis
+
+
+class MemoryBackend:
+    name = "memory"
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+'''
+Default cache backend that lives inside a single worker process. Entries are kept in an OrderedDict so the least recently used entry is the first one evicted once
+max_entries is reached, and every entry carries an expiry time so it is dropped on the next read after its TTL runs out. A lock keeps it safe across request threads.
+'''
+
+
+class RedisBackend:
+    name = "redis"
+
+    def __init__(self, url, prefix="catalog:"):
+        try:
+            import redis
+        except ImportError as err:
+            raise RuntimeError("CATALOG_CACHE_URL is set but the redis package is not installed") from err
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        raw = self._client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def get_many(self, keys):
+        if not keys:
+            return []
+        return [None if raw is None else json.loads(raw) for raw in self._client.mget([self.prefix + key for key in keys])]
+
+    def set(self, key, value, ttl):
+        self._client.set(self.prefix + key, json.dumps(value), px=int(ttl * 1000))
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*[self.prefix + key for key in keys])
+
+    def delete_prefix(self, prefix):
+        keys = list(self._client.scan_iter(match=self.prefix + prefix + "*"))
+        if keys:
+            self._client.delete(*keys)
+
+    def __len__(self):
+        return sum(1 for _ in self._client.scan_iter(match=self.prefix + "*"))
+
+'''
+Shared backend for when several gunicorn workers should see the same cache, it works with Redis or anything that speaks its protocol. Values are stored as JSON with
+a millisecond expiry, and LRU eviction is left to the server (set maxmemory-policy to allkeys-lru). The redis package is only imported when this backend is used.
+'''
+
+
+class CatalogCache:
+    def __init__(self, backend, ttl=60):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _count(self, hits=0, misses=0):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def get_product(self, product_id, loader):
+        key = f"product:{product_id}"
+        value = self.backend.get(key)
+        if value is not None:
+            self._count(hits=1)
+            return value
+        self._count(misses=1)
+        value = loader()
+        if value is not None:
+            self.backend.set(key, value, self.ttl)
+        return value
+
+    def get_products(self, product_ids, loader):
+        product_ids = list(dict.fromkeys(product_ids))
+        cached = self.backend.get_many([f"product:{product_id}" for product_id in product_ids])
+        found = {product_id: value for product_id, value in zip(product_ids, cached) if value is not None}
+        missing = [product_id for product_id in product_ids if product_id not in found]
+        self._count(hits=len(found), misses=len(missing))
+        if missing:
+            for product_id, value in loader(missing).items():
+                self.backend.set(f"product:{product_id}", value, self.ttl)
+                found[product_id] = value
+        return found
+
+    def get_listing(self, args, loader):
+        key = "products:" + json.dumps(args, sort_keys=True, default=str)
+        value = self.backend.get(key)
+        if value is not None:
+            self._count(hits=1)
+            return value
+        self._count(misses=1)
+        value = loader()
+        self.backend.set(key, value, self.ttl)
+        return value
+
+    def invalidate(self, product_id=None):
+        if product_id is not None:
+            self.backend.delete(f"product:{product_id}")
+        self.backend.delete_prefix("products:")
+
+    def clear(self):
+        self.backend.delete_prefix("product")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "ttl": self.ttl,
+        }
+
+'''
+Read-through cache for the product catalog. Single products are cached under product:<id> and every page of the product listing under products:<query args>, each
+loader is only called on a miss and its result is stored for ttl seconds. get_products looks up a whole batch of IDs at once and loads all of the misses together.
+Any change to a product should call invalidate, which drops that product and every cached listing since any page could contain it, and clear drops every product at once
+for bulk changes. Hits and misses are counted per worker.
+'''
+
+
+def create_catalog_cache(config):
+    if config.get('CATALOG_CACHE_URL'):
+        backend = RedisBackend(config['CATALOG_CACHE_URL'])
+    else:
+        backend = MemoryBackend(config.get('CATALOG_CACHE_MAX_ENTRIES', 10000))
+    return CatalogCache(backend, ttl=config.get('CATALOG_CACHE_TTL', 60))
+
+# Builds the catalog cache from our app config, using Redis when CATALOG_CACHE_URL is set and the in-process backend otherwise
+
+
+def get_catalog_cache():
+    return current_app.extensions['catalog_cache']
+
+# Returns the catalog cache create_app set up for the current app
@@ -0,0 +1,50 @@
+import datetime
+import hashlib
+from flask import current_app, request
+
+# Imports what we need to build cache validators and answer conditional GET requests
+
+def page_etag(items, key_name):
+    digest = hashlib.blake2b(digest_size=16)
+    for item in items:
+        digest.update(f"{item[key_name]}@{item['updated_at']};".encode())
+    return digest.hexdigest()
+
+# Builds the ETag for a page of rows from each row's ID and updated_at, so it changes whenever a row on the page is changed, added or removed without hashing the whole body
+
+def last_modified(updated_at):
+    return datetime.datetime.fromisoformat(updated_at).replace(tzinfo=datetime.timezone.utc)
+
+# Turns a serialized updated_at (stored in UTC) back into the datetime used for the Last-Modified header
+
+def is_not_modified(etag, modified=None):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if modified is not None and request.if_modified_since is not None:
+        return modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+# Checks the request's If-None-Match against our ETag, or when there is none its If-Modified-Since against our Last-Modified (HTTP dates only have whole seconds)
+
+def is_conditional():
+    return bool(request.if_none_match) or request.if_modified_since is not None
+
+# True when the client sent If-None-Match or If-Modified-Since, so it is worth looking up the validator before loading the row itself
+
+def conditional_response(etag, cache_control, build, modified=None):
+    if is_not_modified(etag, modified):
+        response = current_app.response_class(status=304)
+    else:
+        response = build()
+    response.set_etag(etag)
+    if modified is not None:
+        response.last_modified = modified
+    if cache_control:
+        response.headers['Cache-Control'] = cache_control
+    return response
+
+'''
+Answers a conditional GET. When the client already has the current version we return an empty 304 without ever calling build, so the body is never serialized,
+otherwise build makes the normal response. Either way the ETag, Last-Modified (when given) and Cache-Control headers are set so clients and our CDN can revalidate
+the next time instead of downloading the body again.
+'''
@@ -0,0 +1,111 @@
+import os
+from urllib.parse import quote_plus
+from dotenv import load_dotenv
+from pooling import TimedQueuePool
+
+load_dotenv()
+
+# Imports what we need to build our settings and loads any variables from a .env file, so the database password no longer has to live in the code
+
+
+def env_bool(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+# Reads an on/off setting from the environment
+
+
+def env_costs(name, default):
+    value = os.environ.get(name)
+    if not value:
+        return default
+    costs = {}
+    for pair in value.split(','):
+        endpoint, cost = pair.split('=')
+        costs[endpoint.strip()] = int(cost)
+    return costs
+
+# Reads per endpoint rate limit costs from the environment, written like orders.place_order=5,orders.get_all_orders=2
+
+
+def database_uri():
+    if os.environ.get('DATABASE_URL'):
+        return os.environ['DATABASE_URL']
+    driver = os.environ.get('DB_DRIVER', 'mysqlconnector')
+    user = os.environ.get('DB_USER', 'root')
+    password = quote_plus(os.environ.get('DB_PASSWORD', ''))
+    host = os.environ.get('DB_HOST', '127.0.0.1')
+    name = os.environ.get('DB_NAME', 'e_commerce_mini_project')
+    return f"mysql+{driver}://{user}:{password}@{host}/{name}"
+
+'''
+Uses DATABASE_URL as is when it is set, which is how we point the app at SQLite (for example sqlite:///e_commerce.db) for local benchmarking. Otherwise the MySQL URL
+is built from DB_USER, DB_PASSWORD, DB_HOST and DB_NAME. DB_DRIVER picks the MySQL driver, mysqlconnector by default or mysqldb for the C based mysqlclient package.
+'''
+
+
+def engine_options(uri):
+    options = {"pool_pre_ping": env_bool('DB_POOL_PRE_PING', True)}
+    if not uri.startswith('sqlite'):
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=int(os.environ.get('DB_POOL_SIZE', 10)),
+            max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+            pool_timeout=float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+            pool_recycle=int(os.environ.get('DB_POOL_RECYCLE', 280)),
+        )
+    return options
+
+'''
+Builds the SQLAlchemy engine settings. pool_pre_ping checks a connection before handing it out and pool_recycle replaces connections before MySQL's wait_timeout
+closes them, which is what caused our stale connection errors. The pool size settings are skipped for SQLite since it manages its own connections. create_app
+calls this with the app's final SQLALCHEMY_DATABASE_URI unless SQLALCHEMY_ENGINE_OPTIONS is set, so a test pointed at SQLite gets SQLite settings.
+'''
+
+
+class Config:
+    SQLALCHEMY_DATABASE_URI = database_uri()
+    CATALOG_CACHE_TTL = int(os.environ.get('CATALOG_CACHE_TTL', 60))
+    CATALOG_CACHE_MAX_ENTRIES = int(os.environ.get('CATALOG_CACHE_MAX_ENTRIES', 10000))
+    CATALOG_CACHE_URL = os.environ.get('CATALOG_CACHE_URL')
+    BULK_BATCH_SIZE = int(os.environ.get('BULK_BATCH_SIZE', 1000))
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'default')
+    METRICS_ENABLED = env_bool('METRICS_ENABLED', True)
+    SLOW_REQUEST_MS = float(os.environ['SLOW_REQUEST_MS']) if os.environ.get('SLOW_REQUEST_MS') else None
+    ORDER_PIPELINE = os.environ.get('ORDER_PIPELINE', 'sync')
+    ORDER_PIPELINE_WORKERS = int(os.environ.get('ORDER_PIPELINE_WORKERS', 2))
+    ORDER_PIPELINE_BATCH_SIZE = int(os.environ.get('ORDER_PIPELINE_BATCH_SIZE', 100))
+    ORDER_PIPELINE_BATCH_WAIT_MS = float(os.environ.get('ORDER_PIPELINE_BATCH_WAIT_MS', 5))
+    ORDER_PIPELINE_MAX_QUEUE = int(os.environ.get('ORDER_PIPELINE_MAX_QUEUE', 10000))
+    CATALOG_CACHE_CONTROL = os.environ.get('CATALOG_CACHE_CONTROL', 'public, no-cache')
+    CUSTOMER_CACHE_CONTROL = os.environ.get('CUSTOMER_CACHE_CONTROL', 'private, no-cache')
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_HASH_SALT_LENGTH = int(os.environ.get('PASSWORD_HASH_SALT_LENGTH', 16))
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 8))
+    PASSWORD_HASH_WAIT_TIMEOUT = float(os.environ.get('PASSWORD_HASH_WAIT_TIMEOUT', 5))
+    RATE_LIMIT_ENABLED = env_bool('RATE_LIMIT_ENABLED', False)
+    RATE_LIMIT_PER_SECOND = float(os.environ.get('RATE_LIMIT_PER_SECOND', 20))
+    RATE_LIMIT_BURST = int(os.environ.get('RATE_LIMIT_BURST', 40))
+    RATE_LIMIT_COSTS = env_costs('RATE_LIMIT_COSTS', {
+        "accounts.add_customer_account": 10,
+        "accounts.update_customer_account": 10,
+        "orders.place_order": 5,
+        "orders.update_order": 5,
+        "orders.update_order_items": 5,
+        "orders.get_all_orders": 2,
+        "customers.get_customer_orders": 2,
+        "orders.export_all_orders": 20,
+        "customers.add_customers_bulk": 20,
+        "products.add_products_bulk": 20,
+        "order_details.add_order_details_bulk": 20,
+    })
+    RATE_LIMIT_KEY_HEADER = os.environ.get('RATE_LIMIT_KEY_HEADER', 'X-API-Key')
+    RATE_LIMIT_URL = os.environ.get('RATE_LIMIT_URL')
+    RATE_LIMIT_MAX_CLIENTS = int(os.environ.get('RATE_LIMIT_MAX_CLIENTS', 100000))
+    MAX_CONCURRENT_REQUESTS = int(os.environ.get('MAX_CONCURRENT_REQUESTS', 0))
+    CONCURRENCY_WAIT_MS = float(os.environ.get('CONCURRENCY_WAIT_MS', 100))
+
+# All of our app settings, each one can be overridden with an environment variable of the same name
@@ -0,0 +1,102 @@
+import csv
+import datetime
+import io
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import func, or_, select
+from extensions import db
+from models import Customer, Order, OrderItem, Product
+from serializers import STREAM_CHUNK_SIZE
+
+EXPORT_FORMATS = ("csv", "ndjson")
+EXPORT_MIMETYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# Imports what the order export needs, along with the formats it can write and the content type of each
+
+def export_query(date_from=None, date_to=None, since=None, until=None):
+    query = (select(Order.order_id, Order.date, Order.order_status, Order.total_price.label("order_total"),
+                    Order.customer_id, Customer.name.label("customer_name"), Customer.email.label("customer_email"),
+                    OrderItem.product_id, Product.name.label("product_name"), Product.product_type,
+                    OrderItem.quantity, OrderItem.unit_price, (OrderItem.quantity * OrderItem.unit_price).label("line_total"))
+             .select_from(Order)
+             .join(OrderItem, OrderItem.order_id == Order.order_id)
+             .outerjoin(Product, Product.product_id == OrderItem.product_id)
+             .outerjoin(Customer, Customer.customer_id == Order.customer_id)
+             .order_by(OrderItem.order_id, OrderItem.product_id))
+    if date_from is not None:
+        query = query.where(Order.date >= date_from)
+    if date_to is not None:
+        query = query.where(Order.date <= date_to)
+    if since is not None:
+        query = query.where(Order.order_id > since)
+    if until is not None:
+        query = query.where(Order.order_id <= until)
+    return query
+
+'''
+Builds the export query, one row per order line with the order, its customer and the product joined in. Customer and product are outer joins, so a line is never
+left out because one of them is gone, it just comes out with empty names. It selects plain columns so rows come back as tuples and no ORM objects are built, and it is
+ordered by the Order_Detail primary key so the database walks Order_Detail in index order and looks up each order, product and customer by primary key without
+sorting anything. since and until limit it to a range of order IDs for incremental exports, and date_from and date_to to a range of order dates.
+'''
+
+def last_order_id():
+    return db.session.execute(select(func.max(Order.order_id))).scalar() or 0
+
+# The newest order ID right now, an export stops here so the caller knows exactly where the next incremental export should start
+
+def export_value(value):
+    if isinstance(value, (datetime.date, Decimal)):
+        return str(value)
+    return value
+
+# Dates are written as YYYY-MM-DD and money as an exact decimal string so nothing is lost to floats
+
+def export_partitions(query):
+    chunk_query = query
+    while True:
+        chunk = db.session.execute(chunk_query.limit(STREAM_CHUNK_SIZE)).all()
+        if not chunk:
+            return
+        yield chunk
+        if len(chunk) < STREAM_CHUNK_SIZE:
+            return
+        last = chunk[-1]
+        chunk_query = query.where(OrderItem.order_id >= last.order_id, or_(OrderItem.order_id > last.order_id, OrderItem.product_id > last.product_id))
+
+'''
+Runs the export STREAM_CHUNK_SIZE rows at a time, each chunk picking up after the (order_id, product_id) of the last line in the one before, so only one chunk is ever
+held in memory. This works the same with every driver, unlike yield_per which mysqlconnector cannot stream since it has no server side cursors. The order_id >= part
+lets the database jump straight to where the chunk starts in the Order_Detail primary key.
+'''
+
+def csv_chunks(partitions, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for chunk in partitions:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([export_value(value) for value in row] for row in chunk)
+        yield buffer.getvalue()
+
+# Writes a header line and then each chunk of rows as CSV, reusing one buffer
+
+def ndjson_chunks(partitions, columns):
+    dumps = current_app.json.dumps
+    for chunk in partitions:
+        yield "".join(dumps({column: export_value(value) for column, value in zip(columns, row)}) + "\n" for row in chunk)
+
+# Writes each chunk of rows as one JSON object per line
+
+def export_orders(export_format, date_from=None, date_to=None, since=None, until=None):
+    query = export_query(date_from, date_to, since, until)
+    columns = [column.name for column in query.selected_columns]
+    chunks = csv_chunks if export_format == "csv" else ndjson_chunks
+    return chunks(export_partitions(query), columns)
+
+'''
+Returns a generator of text chunks holding every order line that matches, as CSV or NDJSON. Nothing is read until the first chunk is asked for, and memory use stays the
+same however many orders there are since rows are streamed from the database and written out a chunk at a time. Used by GET /orders/export and flask export-orders.
+'''
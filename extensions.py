@@ -0,0 +1,9 @@
+from flask_sqlalchemy import SQLAlchemy
+from flask_marshmallow import Marshmallow
+from flask_cors import CORS
+
+db = SQLAlchemy()
+ma = Marshmallow()
+cors = CORS()
+
+# Creates our Flask extensions without an app so models and schemas can import them, create_app binds them to the app later
@@ -0,0 +1,156 @@
+import atexit
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash, check_password_hash
+from metrics import Histogram, LATENCY_BUCKETS
+
+# Imports werkzeug's password helpers and what we need to run them in a pool of worker processes and time them
+
+
+class HashingBusy(Exception):
+    pass
+
+# Raised when every hashing slot stayed taken for longer than the wait timeout, routes answer it with a 503
+
+
+def run_timed(function, *args):
+    started = time.time()
+    result = function(*args)
+    return result, started, time.time()
+
+# Runs in the worker process and returns the result along with when the work started and finished, so the caller can tell queue time apart from hashing time
+
+
+class PasswordHasher:
+    operations = ('hash', 'verify')
+
+    def __init__(self, method='scrypt', salt_length=16, workers=2, max_pending=8, wait_timeout=5.0):
+        self.method = method
+        self.salt_length = salt_length
+        self.workers = workers
+        self.max_pending = max_pending
+        self.wait_timeout = wait_timeout
+        self.rejected = 0
+        self.restarts = 0
+        self.in_flight = 0
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._queue_time = {operation: Histogram(LATENCY_BUCKETS) for operation in self.operations}
+        self._run_time = {operation: Histogram(LATENCY_BUCKETS) for operation in self.operations}
+
+    def hash(self, password):
+        return self._run('hash', generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, password_hash, password):
+        return self._run('verify', check_password_hash, password_hash, password)
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+                    atexit.register(self.shutdown)
+        return self._executor
+
+    def _discard_executor(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+                self.restarts += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, function, *args):
+        executor = self._get_executor()
+        try:
+            return executor.submit(run_timed, function, *args).result()
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+        executor = self._get_executor()
+        try:
+            return executor.submit(run_timed, function, *args).result()
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+            raise HashingBusy()
+
+    # Runs one hash in the pool. When a worker process dies (killed for memory, a crash) the executor is broken for good and every later submit fails straight away,
+    # so the broken one is thrown out for the next call to replace and the hash is tried once more on a fresh pool. If that pool breaks too the request gets
+    # HashingBusy (a 503) and the next request starts over with another new pool
+
+    def _run(self, operation, function, *args):
+        submitted = time.time()
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            with self._lock:
+                self.rejected += 1
+            raise HashingBusy()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            if self.workers:
+                result, started, finished = self._submit(function, *args)
+            else:
+                result, started, finished = run_timed(function, *args)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+        with self._lock:
+            self._queue_time[operation].observe(max(started - submitted, 0.0))
+            self._run_time[operation].observe(finished - started)
+        return result
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def metric_lines(self):
+        lines = []
+        with self._lock:
+            for name, help_text, histograms in (
+                ('password_hash_queue_seconds', 'Time password hashing waited for a slot and a worker process.', self._queue_time),
+                ('password_hash_duration_seconds', 'Time spent hashing or verifying a password.', self._run_time),
+            ):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for operation in self.operations:
+                    lines.extend(histograms[operation].render(name, f'operation="{operation}"'))
+            for name, help_text, value in (
+                ('password_hash_in_flight', 'Passwords being hashed or verified right now.', self.in_flight),
+                ('password_hash_rejected_total', 'Hashing requests turned away because every slot was taken.', self.rejected),
+                ('password_hash_pool_restarts_total', 'Times the hashing pool was replaced after one of its worker processes died.', self.restarts),
+            ):
+                lines.extend([f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {value}'])
+        return lines
+
+'''
+Hashes and checks passwords off the request thread. scrypt and pbkdf2 are slow on purpose and hold the GIL while they run, so doing them inline lets a burst of signups
+stall every other route in the worker. Instead they run in a pool of worker processes (created with the first password, with spawn so the children do not inherit our
+threads and database connections), and at most max_pending hashes can be running or queued at once. A request that cannot get a slot within wait_timeout seconds gets
+HashingBusy instead of piling up behind the others. A pool that lost a worker process is replaced on the spot, see _submit. workers=0 hashes on the request thread
+but still applies the cap. method and salt_length are passed straight to werkzeug's generate_password_hash, for example scrypt:32768:8:1 or pbkdf2:sha256:600000.
+Queue time and hashing time are recorded per operation for /metrics.
+Since spawned workers import the main module again, scripts that create our app themselves need the usual if __name__ == "__main__": guard.
+'''
+
+
+def create_password_hasher(config):
+    return PasswordHasher(method=config.get('PASSWORD_HASH_METHOD', 'scrypt'), salt_length=config.get('PASSWORD_HASH_SALT_LENGTH', 16),
+                          workers=config.get('PASSWORD_HASH_WORKERS', 2), max_pending=config.get('PASSWORD_HASH_MAX_PENDING', 8),
+                          wait_timeout=config.get('PASSWORD_HASH_WAIT_TIMEOUT', 5.0))
+
+# Builds the password hasher from our app config
+
+
+def get_password_hasher():
+    if has_app_context() and 'password_hasher' in current_app.extensions:
+        return current_app.extensions['password_hasher']
+    return inline_hasher
+
+inline_hasher = PasswordHasher(workers=0, max_pending=1000)
+
+# Returns the password hasher create_app set up, falling back to hashing inline with werkzeug's defaults when called outside of our app (like from a script)
@@ -0,0 +1,166 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+slow_request_logger = logging.getLogger('slow_requests')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+MAX_SLOW_STATEMENTS = 100
+
+# Imports what we need to time requests and queries. The buckets are the upper bounds of our histograms, in seconds for latencies and in statements for query counts,
+# and MAX_SLOW_STATEMENTS caps how much SQL the slow request log keeps for a single request
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[position] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        for bound, count in zip(self.buckets, self.counts):
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+# Cumulative histogram in the same shape Prometheus uses, every bucket counts the observations less than or equal to its bound
+
+
+class Metrics:
+    histograms = (
+        ('http_request_duration_seconds', 'Time spent handling each request.', LATENCY_BUCKETS),
+        ('db_queries_per_request', 'Number of SQL statements run by each request.', QUERY_COUNT_BUCKETS),
+        ('db_time_seconds', 'Time each request spent waiting on SQL statements.', LATENCY_BUCKETS),
+        ('serialization_duration_seconds', 'Time each request spent serializing its response, building the data and encoding it as JSON.', LATENCY_BUCKETS),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {name: {} for name, help_text, buckets in self.histograms}
+        self._requests = {}
+
+    def observe_request(self, endpoint, method, status, seconds, queries, db_seconds, serialization_seconds):
+        labels = f'endpoint="{endpoint}",method="{method}"'
+        values = (seconds, queries, db_seconds, serialization_seconds)
+        with self._lock:
+            for (name, help_text, buckets), value in zip(self.histograms, values):
+                self._histograms[name].setdefault(labels, Histogram(buckets)).observe(value)
+            key = f'{labels},status="{status}"'
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+    def render(self, extra_lines=()):
+        lines = []
+        with self._lock:
+            lines.append('# HELP http_requests_total Requests handled by endpoint, method and status.')
+            lines.append('# TYPE http_requests_total counter')
+            for labels, count in sorted(self._requests.items()):
+                lines.append(f'http_requests_total{{{labels}}} {count}')
+            for name, help_text, buckets in self.histograms:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for labels, histogram in sorted(self._histograms[name].items()):
+                    lines.extend(histogram.render(name, labels))
+        lines.extend(extra_lines)
+        return "\n".join(lines) + "\n"
+
+'''
+Collects everything /metrics reports for this worker: a request counter by endpoint, method and status code, and per endpoint histograms of latency, how many
+SQL statements each request ran, how long those statements took and how long it took to serialize the response. render returns them in the Prometheus
+text format, with any extra_lines (such as the pool and cache gauges) added at the end.
+'''
+
+
+def gauge(name, help_text, value):
+    return [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {value}']
+
+# Formats a single unlabelled gauge for the Prometheus text format
+
+
+@contextmanager
+def serialization_timer():
+    if not has_request_context():
+        yield
+        return
+    depth = g.get('serialization_depth', 0)
+    g.serialization_depth = depth + 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        g.serialization_depth = depth
+        if depth == 0:
+            g.serialization_time = g.get('serialization_time', 0.0) + time.perf_counter() - start
+
+'''
+Adds the time spent inside the block to the current request's serialization time. Our schemas and fast serializers call this from dump and our JSON providers
+from jsonify, and since a schema's jsonify calls both only the outermost block is counted so nothing is timed twice.
+'''
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_start_time'] = time.perf_counter()
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop('query_start_time')
+    if has_request_context() and 'request_start_time' in g:
+        g.query_count += 1
+        g.db_time += elapsed
+        if g.slow_statements is not None and len(g.slow_statements) < MAX_SLOW_STATEMENTS:
+            g.slow_statements.append((statement, elapsed))
+
+# SQLAlchemy event hooks that time every statement and add it to the request that ran it, also keeping the SQL itself when the slow request log is turned on
+# A connection runs one statement at a time, so it only needs one start time. after_cursor_execute never runs for a statement that fails, whose start time is
+# simply overwritten by the next statement instead of piling up on the pooled connection
+
+
+def init_metrics(app, db):
+    metrics = Metrics()
+    app.extensions['metrics'] = metrics
+    slow_request_ms = app.config.get('SLOW_REQUEST_MS')
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_start_time = time.perf_counter()
+        g.query_count = 0
+        g.db_time = 0.0
+        g.slow_statements = [] if slow_request_ms else None
+
+    @app.after_request
+    def record_request_metrics(response):
+        if 'request_start_time' not in g:
+            return response
+        elapsed = time.perf_counter() - g.request_start_time
+        endpoint = request.endpoint or 'unmatched'
+        metrics.observe_request(endpoint, request.method, response.status_code, elapsed, g.query_count, g.db_time, g.get('serialization_time', 0.0))
+        if slow_request_ms and elapsed * 1000 >= slow_request_ms:
+            statements = "\n".join(f"  {seconds * 1000:.1f} ms  {statement}" for statement, seconds in g.slow_statements)
+            slow_request_logger.warning("Slow request %s %s took %.1f ms with %d queries (%.1f ms in the database)\n%s",
+                                        request.method, request.full_path, elapsed * 1000, g.query_count, g.db_time * 1000, statements)
+        return response
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+    return metrics
+
+'''
+Turns on request metrics for our app. before_request starts the clock and zeroes the query counters, the SQLAlchemy hooks add each statement to them, and after_request
+records everything against the endpoint that handled the request. When SLOW_REQUEST_MS is set any request at least that slow is logged to the slow_requests logger
+along with the SQL it ran and how long each statement took.
+'''
@@ -0,0 +1,121 @@
+import datetime
+import logging
+from decimal import Decimal
+from extensions import db
+from hashing import get_password_hasher
+
+logger = logging.getLogger(__name__)
+
+CENT = Decimal('0.01')
+
+# Imports our database and the password hasher, and creates the logger used for debug output (silent unless the log level is set to DEBUG). Money on orders is kept to the CENT
+
+def utcnow():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+class PreciseDateTime(db.TypeDecorator):
+    impl = db.DateTime
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'mysql':
+            from sqlalchemy.dialects.mysql import DATETIME
+            return dialect.type_descriptor(DATETIME(fsp=6))
+        return dialect.type_descriptor(db.DateTime())
+
+# Current UTC time for our updated_at columns, and the column type they use. It keeps microseconds on MySQL too (its DATETIME drops them by default) so two changes in
+# the same second still get different ETags, the MySQL type is only imported when we are actually talking to MySQL
+
+class Customer(db.Model):
+    __tablename__ = 'Customers'
+    customer_id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(255), nullable=False)
+    email = db.Column(db.String(320))
+    phone = db.Column(db.String(15))
+    updated_at = db.Column(PreciseDateTime, nullable=False, default=utcnow, onupdate=utcnow)
+    orders= db.relationship('Order', backref='customer')
+    order_summary = db.relationship('CustomerOrderSummary', uselist=False, cascade='all, delete-orphan')
+
+# Configures Customer table and creates relationship with Order Table, deleting a customer also deletes their order summary. updated_at changes on every update and is what our ETags are built from
+
+class CustomerAccount(db.Model):
+    __tablename__ = "Customer_Accounts"
+    account_id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(255), unique=True, nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey('Customers.customer_id'))
+    customer = db.relationship('Customer', backref='customer_account', uselist=False)
+
+    def set_password(self, password):
+        self.password_hash = get_password_hasher().hash(password)
+    
+    def check_password(self, password):
+        return get_password_hasher().verify(self.password_hash, password)
+
+# Creates table for Customer Account while also defining set password and check password methods to ensure password is secure, the hashing itself runs in the password hasher's worker processes
+
+class CustomerOrderSummary(db.Model):
+    __tablename__ = "Customer_Order_Summary"
+    customer_id = db.Column(db.Integer, db.ForeignKey('Customers.customer_id'), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    lifetime_spend = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    last_order_date = db.Column(db.Date)
+
+# One row per customer with their order count, total spent and latest order date, kept up to date by summaries.py every time an order is written so nothing has to add up the Orders table to show them
+
+def price_snapshot(price):
+    return Decimal(str(price)).quantize(CENT)
+
+# Turns a product's price into the exact decimal we store on an order line, going through str so a float like 19.99 becomes 19.99 and not 19.989999...
+
+class OrderItem(db.Model):
+    __tablename__ = "Order_Detail"
+    order_id = db.Column(db.Integer, db.ForeignKey('Orders.order_id'), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('Products.product_id'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    unit_price = db.Column(db.Numeric(10, 2), nullable=False)
+
+order_detail = OrderItem.__table__
+
+#Creates the Order_Detail table, one line per product on an order with how many were bought and the price each one was sold at. The price is copied from the product
+#when the line is written, so changing a product's price later does not change orders that were already placed
+
+class Product(db.Model):
+    __tablename__ = "Products"
+    product_id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(255), nullable=False)
+    product_type = db.Column(db.String(255), nullable=False)
+    price = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(PreciseDateTime, nullable=False, default=utcnow, onupdate=utcnow)
+
+    __table_args__ = (
+        db.Index('ix_products_type_id', 'product_type', 'product_id'),
+        db.Index('ix_products_name', 'name'),
+        db.Index('ix_products_price', 'price'),
+    )
+
+#Configures Product Table with an updated_at column for our ETags, and indexes for filtering by type, name prefix and price range. The type index ends with product_id so a filtered page can be read in cursor order straight from it
+
+class Order(db.Model):
+    __tablename__ = "Orders"
+    order_id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey('Customers.customer_id'))
+    order_status = db.Column(db.String(50), nullable=False)
+    items = db.relationship("OrderItem", cascade="all, delete-orphan", order_by=OrderItem.product_id)
+    total_price = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_orders_customer_date', 'customer_id', 'date'),
+        db.Index('ix_orders_status_id', 'order_status', 'order_id'),
+        db.Index('ix_orders_date', 'date'),
+    )
+
+    def calculate_total_price(self):
+        total_price = sum([item.quantity * item.unit_price for item in self.items], Decimal('0.00'))
+        logger.debug("Order %s total price %s", self.order_id, total_price)
+        self.total_price = total_price
+
+# Configures Order table with its lines in items (a line taken out of items is deleted), also relates back to customer through foreign key.
+# Also uses a list comprehension to total up the order's lines from their stored prices, so the total is exact and never needs the Products table
+# Indexes support filtering by customer (optionally within a date range), by status in cursor order, and by date range
@@ -0,0 +1,72 @@
+from sqlalchemy import bindparam, delete, select, update
+from extensions import db
+from models import Order, OrderItem, Product, order_detail, price_snapshot
+from summaries import refresh_order_totals
+
+# Imports what we need to change the lines on an order in place
+
+
+def lock_order(order_id):
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return db.session.execute(update(Order).where(Order.order_id == order_id).values(total_price=Order.total_price)).rowcount > 0
+    return db.session.execute(select(Order.order_id).where(Order.order_id == order_id).with_for_update()).first() is not None
+
+# Locks one order row until the transaction ends with SELECT ... FOR UPDATE and returns whether the order exists. SQLite has no FOR UPDATE, so there we run an UPDATE
+# that changes nothing, which takes SQLite's database wide write lock up front so the reads that follow cannot go stale before we write
+
+
+def lock_orders(order_ids):
+    order_ids = sorted(set(order_ids))
+    if not order_ids:
+        return set()
+    if db.session.get_bind().dialect.name == 'sqlite':
+        db.session.execute(update(Order).where(Order.order_id.in_(order_ids)).values(total_price=Order.total_price))
+        return set(db.session.execute(select(Order.order_id).where(Order.order_id.in_(order_ids))).scalars())
+    return set(db.session.execute(select(Order.order_id).where(Order.order_id.in_(order_ids)).order_by(Order.order_id).with_for_update()).scalars())
+
+# Same as lock_order for a batch of orders, returning the IDs that exist. The rows are locked in order_id order so two batches sharing orders cannot deadlock each other
+
+
+def change_order_items(order_id, add=None, remove=()):
+    add = add or {}
+    remove = set(remove)
+    if not lock_order(order_id):
+        return "Order not found"
+
+    current = set(db.session.execute(select(OrderItem.product_id)
+                                     .where(OrderItem.order_id == order_id, OrderItem.product_id.in_(remove | set(add)))
+                                     .with_for_update()).scalars())
+    missing = sorted(remove - current)
+    if missing:
+        return f"Product with ID {missing} not found in order"
+
+    new_ids = [product_id for product_id in add if product_id not in current or product_id in remove]
+    prices = dict(db.session.execute(select(Product.product_id, Product.price).where(Product.product_id.in_(new_ids))).all()) if new_ids else {}
+    missing = [product_id for product_id in new_ids if product_id not in prices]
+    if missing:
+        return f"Product with ID {missing} not found"
+
+    if remove:
+        db.session.execute(delete(order_detail).where(order_detail.c.order_id == order_id, order_detail.c.product_id.in_(remove)))
+    increments = [{"line_order_id": order_id, "line_product_id": product_id, "extra": quantity}
+                  for product_id, quantity in add.items() if product_id not in new_ids]
+    if increments:
+        db.session.execute(update(order_detail)
+                           .where(order_detail.c.order_id == bindparam("line_order_id"), order_detail.c.product_id == bindparam("line_product_id"))
+                           .values(quantity=order_detail.c.quantity + bindparam("extra")), increments)
+    if new_ids:
+        db.session.execute(order_detail.insert(), [{"order_id": order_id, "product_id": product_id, "quantity": add[product_id], "unit_price": price_snapshot(prices[product_id])}
+                                                   for product_id in new_ids])
+    refresh_order_totals([order_id])
+    return None
+
+'''
+Applies a batch of line changes to one order inside the caller's transaction and returns an error message (with nothing changed) or None, the caller commits.
+add maps product IDs to how many to add, a product already on the order just has its quantity raised and a new one takes the product's current price. remove is
+a list of product IDs whose lines are dropped, and is applied first, so a product in both is replaced by a fresh line at today's price.
+
+The order row is locked with SELECT ... FOR UPDATE before anything is read, so concurrent changes to the same order (from here, the order details routes including
+the bulk one, which takes the same locks with lock_orders, or another worker) run one after the other instead of racing, and the lines it touches are read with a locking read so they are always the latest committed ones. The lines are
+then changed with plain DELETE, UPDATE and INSERT statements on Order_Detail (each one a single statement however many products are in the batch) without loading
+any ORM objects, and the order total and the customer's lifetime spend are recomputed once at the end.
+'''
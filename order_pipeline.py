@@ -0,0 +1,191 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+from extensions import db
+from models import Order, order_detail
+from summaries import record_order_change
+
+logger = logging.getLogger(__name__)
+
+MAX_TRACKED_ORDERS = 100000
+STOP = object()
+
+# Imports what our order writers need. MAX_TRACKED_ORDERS caps how many order tokens we remember the status of, and STOP tells a worker thread to exit
+
+
+def order_total(order):
+    return sum((quantity * order['prices'][product_id] for product_id, quantity in order['items'].items()), Decimal('0.00'))
+
+# Adds up an order's lines from the prices it was placed at
+
+
+def write_orders(orders):
+    new_orders = [Order(customer_id=order['customer_id'], date=order['date'], order_status=order['order_status'], total_price=order_total(order))
+                  for order in orders]
+    db.session.add_all(new_orders)
+    db.session.flush()
+    db.session.execute(order_detail.insert(), [{"order_id": new_order.order_id, "product_id": product_id, "quantity": quantity, "unit_price": order['prices'][product_id]}
+                                               for new_order, order in zip(new_orders, orders) for product_id, quantity in order['items'].items()])
+    totals = {}
+    for new_order in new_orders:
+        count, spend = totals.get(new_order.customer_id, (0, 0))
+        totals[new_order.customer_id] = (count + 1, spend + new_order.total_price)
+    for customer_id, (count, spend) in totals.items():
+        record_order_change(customer_id, count, spend)
+    return new_orders
+
+'''
+Writes already validated orders without committing, used by both POST /orders and the pipeline workers. Each order is a dict of customer_id, date, order_status,
+items, which maps every product in the order to how many were bought, and prices, which maps every product to the price it was sold at as an exact decimal.
+All of the Order rows are flushed together with their totals, every Order_Detail line goes in with one executemany, and each customer's order summary is updated
+once no matter how many of their orders are in the batch.
+'''
+
+
+class OrderPipeline:
+    def __init__(self, app, workers=2, batch_size=100, max_queue=10000, batch_wait=0.005):
+        self.app = app
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.committed = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._statuses = OrderedDict()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, order):
+        self._start()
+        token = uuid.uuid4().hex
+        self._set_status(token, {"status": "queued"})
+        try:
+            self._queue.put_nowait((token, order))
+        except queue.Full:
+            with self._lock:
+                del self._statuses[token]
+            raise
+        return token
+
+    def status(self, token):
+        with self._lock:
+            status = self._statuses.get(token)
+            return None if status is None else dict(status)
+
+    def stats(self):
+        return {"workers": self.workers, "queued": self._queue.qsize(), "committed": self.committed, "failed": self.failed}
+
+    def join(self):
+        self._queue.join()
+
+    def stop(self):
+        for thread in self._threads:
+            self._queue.put(STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _set_status(self, token, status):
+        with self._lock:
+            self._statuses[token] = status
+            self._statuses.move_to_end(token)
+            while len(self._statuses) > MAX_TRACKED_ORDERS:
+                self._statuses.popitem(last=False)
+
+    def _start(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            self._threads = [threading.Thread(target=self._work, name=f"order-pipeline-{i}", daemon=True) for i in range(self.workers)]
+            for thread in self._threads:
+                thread.start()
+        atexit.register(self.stop)
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is STOP:
+                self._queue.task_done()
+                return
+            batch = [item]
+            stopping = False
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            finished = set()
+            try:
+                with self.app.app_context():
+                    self._commit_batch(batch, finished)
+            except Exception:
+                logger.exception("Order pipeline could not write a batch of %d orders", len(batch))
+                for token, order in batch:
+                    if token not in finished:
+                        self._finish(token, {"status": "failed", "error": "Internal error"}, finished)
+            for item in batch:
+                self._queue.task_done()
+            if stopping:
+                self._queue.task_done()
+                return
+
+    def _commit_batch(self, batch, finished):
+        try:
+            order_ids = [new_order.order_id for new_order in write_orders([order for token, order in batch])]
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            for token, order in batch:
+                try:
+                    order_id = write_orders([order])[0].order_id
+                    db.session.commit()
+                except SQLAlchemyError as err:
+                    db.session.rollback()
+                    logger.warning("Order pipeline rejected order %s: %s", token, getattr(err, 'orig', err))
+                    self._finish(token, {"status": "failed", "error": str(getattr(err, 'orig', err))}, finished)
+                else:
+                    self._finish(token, {"status": "committed", "order_id": order_id}, finished)
+            return
+        for (token, order), order_id in zip(batch, order_ids):
+            self._finish(token, {"status": "committed", "order_id": order_id}, finished)
+
+    def _finish(self, token, status, finished):
+        finished.add(token)
+        with self._lock:
+            if status["status"] == "committed":
+                self.committed += 1
+            else:
+                self.failed += 1
+        self._set_status(token, status)
+
+'''
+Optional asynchronous order pipeline, turned on with ORDER_PIPELINE=async. POST /orders validates an order, submits it here and answers 202 with a token right away,
+then a pool of worker threads takes orders off a bounded in-process queue and commits them in micro-batches: a worker waits up to batch_wait seconds for up to
+batch_size orders and writes them in a single transaction. If the database rejects a batch it is retried one order at a time so only the bad orders fail, and if
+something else goes wrong part way through, only the orders that were not already committed or rejected are marked failed.
+Each token's status (queued, committed with its order_id, or failed with the error) is kept for the most recent MAX_TRACKED_ORDERS orders.
+
+The queue and statuses live in the worker process that accepted the order, so a status has to be asked for from the same process, and orders still waiting in the
+queue are lost if the process crashes (on a normal exit the queue is drained first). submit raises queue.Full once max_queue orders are waiting.
+'''
+
+
+def get_order_pipeline():
+    return current_app.extensions.get('order_pipeline')
+
+# Returns the order pipeline for the current app, or None when orders are written synchronously
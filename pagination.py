@@ -0,0 +1,79 @@
+from sqlalchemy import select
+from flask import current_app, jsonify, request, Response, stream_with_context, url_for
+from marshmallow import ValidationError
+from schemas import page_args_schema, DEFAULT_PAGE_SIZE
+from conditional import page_etag, conditional_response, is_conditional
+from extensions import db
+
+# Imports what our list endpoints share
+
+def list_rows(key, serializer, options=(), cache=None, filter_schema=None, filter_clauses=None, where=(), cache_control=None):
+    try:
+        page = page_args_schema.load(request.args)
+        filters = filter_schema.load(request.args) if filter_schema else {}
+    except ValidationError as err:
+        return jsonify(err.messages), 400
+
+    clauses = list(where)
+    if filters:
+        clauses += filter_clauses(filters)
+    if 'after' in page:
+        clauses.append(key > page['after'])
+    query = serializer.select(options).where(*clauses).order_by(key)
+
+    if page['format'] == 'ndjson':
+        return Response(stream_with_context(stream_rows(query, key, serializer, page.get('limit'))), mimetype='application/x-ndjson')
+
+    limit = page.get('limit', DEFAULT_PAGE_SIZE)
+    if cache is None and cache_control is not None and is_conditional():
+        stamps, next_after = fetch_page_stamps(select(key, key.class_.updated_at).where(*clauses).order_by(key), key, limit)
+        response = conditional_response(page_etag(stamps, key.key), cache_control, lambda: jsonify(fetch_page(query, key, serializer, limit)[0]))
+    else:
+        if cache is None:
+            items, next_after = fetch_page(query, key, serializer, limit)
+        else:
+            items, next_after = cache.get_listing({**page, **filters}, lambda: fetch_page(query, key, serializer, limit))
+        if cache_control is None:
+            response = jsonify(items)
+        else:
+            response = conditional_response(page_etag(items, key.key), cache_control, lambda: jsonify(items))
+    if next_after is not None:
+        args = {**(filter_schema.dump(filters) if filter_schema else {}), "limit": limit, "after": next_after, **request.view_args}
+        response.headers['X-Next-Cursor'] = str(next_after)
+        response.headers['Link'] = f'<{url_for(request.endpoint, **args)}>; rel="next"'
+    return response
+
+'''
+Shared by all of our GET list endpoints. Reads limit, after and format from the query string and uses keyset pagination on the primary key, so each page is a
+single indexed range scan no matter how deep into the table the client is. Only limit + 1 rows are fetched so we know if there is another page, in which case the
+cursor for it is returned in the X-Next-Cursor and Link headers. With format=ndjson the rows are streamed back one JSON object per line instead.
+Endpoints that support filtering pass a filter_schema for their query arguments and a filter_clauses function that turns the loaded filters into WHERE clauses, so
+filtering happens in SQL and the next page link keeps the same filters, and where adds fixed clauses such as the customer in /customers/<id>/orders. The link is
+built only from the parsed page and filter arguments plus the route's own arguments, so anything else in the query string (including url_for's _external or _scheme)
+is left out of it. Rows are fetched and dumped by one of the fast serializers in serializers.py, and if a cache
+is passed in, JSON pages are served from it (keyed by page and filters) and only fetched on a miss. Endpoints whose rows have an updated_at can pass cache_control
+to get an ETag on every page and a 304 without the body when the client's copy is still current. For a conditional request on an uncached listing the ETag is
+built from just the key and updated_at of the page's rows, and the full rows are only loaded and dumped when it does not match.
+'''
+
+def fetch_page(query, key, serializer, limit):
+    rows = serializer.fetch(query.limit(limit + 1))
+    items = serializer.dump(rows[:limit])
+    next_after = items[-1][key.key] if len(rows) > limit else None
+    return items, next_after
+
+# Runs the page query and returns the serialized rows along with the cursor for the next page, or None when this is the last page
+
+def fetch_page_stamps(query, key, limit):
+    rows = db.session.execute(query.limit(limit + 1)).all()
+    stamps = [{key.key: row_key, 'updated_at': updated_at.isoformat()} for row_key, updated_at in rows[:limit]]
+    next_after = stamps[-1][key.key] if len(rows) > limit else None
+    return stamps, next_after
+
+# Same as fetch_page but only reads each row's key and updated_at, in the same form the serializers dump them, which is all page_etag needs
+
+def stream_rows(query, key, serializer, limit=None):
+    for chunk in serializer.partitions(query, key, limit):
+        yield "".join(current_app.json.dumps(row) + "\n" for row in serializer.dump(chunk))
+
+# Fetches rows from the database a keyset chunk at a time (at most limit rows) and yields each chunk as NDJSON so memory stays flat for any table size
@@ -0,0 +1,47 @@
+import threading
+import time
+from sqlalchemy.pool import QueuePool
+
+# Imports the SQLAlchemy connection pool we build on
+
+
+class TimedQueuePool(QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._wait_lock = threading.Lock()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            with self._wait_lock:
+                self.wait_count += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+'''
+The same QueuePool SQLAlchemy uses by default, but it also times how long each checkout spends waiting for a free connection. Waits only get long when every
+connection in the pool and its overflow is in use, so a growing average or max here means pool_size or max_overflow is too small for the load.
+'''
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__, "status": pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update(size=pool.size(), checked_in=pool.checkedin(), checked_out=pool.checkedout(), overflow=pool.overflow())
+    if isinstance(pool, TimedQueuePool):
+        stats.update(
+            checkouts=pool.wait_count,
+            wait_total_seconds=pool.wait_total,
+            wait_avg_seconds=pool.wait_total / pool.wait_count if pool.wait_count else 0.0,
+            wait_max_seconds=pool.wait_max,
+        )
+    return stats
+
+# Returns the current state of an engine's connection pool, including checkout wait times when the pool is a TimedQueuePool
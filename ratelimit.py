@@ -0,0 +1,218 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from flask import g, jsonify, request
+from metrics import gauge
+
+EXEMPT_ENDPOINTS = frozenset({'main.get_metrics', 'main.get_pool_stats', 'main.get_cache_stats'})
+
+# Imports what our admission control needs. The stats endpoints are never limited so we can still see what is going on while the app is shedding load
+
+
+TAKE_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(now - updated, 0) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+# Token bucket as a Redis script so reading, refilling and taking from a bucket happens in one step no matter how many workers share it, timed with the Redis clock
+
+
+class MemoryBucketStore:
+    name = "memory"
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, cost, rate, burst):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+    def __len__(self):
+        return len(self._buckets)
+
+'''
+Default bucket store that lives inside a single worker process. Each client's bucket is just how many tokens it had and when, and it is refilled at rate tokens a
+second (up to burst) the next time that client shows up, so nothing has to run in the background. Buckets are kept in an OrderedDict and the least recently seen
+client is dropped once max_keys is reached, which only ever hands that client a full bucket again.
+'''
+
+
+class RedisBucketStore:
+    name = "redis"
+
+    def __init__(self, url, prefix="ratelimit:"):
+        try:
+            import redis
+        except ImportError as err:
+            raise RuntimeError("RATE_LIMIT_URL is set but the redis package is not installed") from err
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._take = self._client.register_script(TAKE_SCRIPT)
+
+    def take(self, key, cost, rate, burst):
+        allowed, tokens = self._take(keys=[self.prefix + key], args=[rate, burst, cost])
+        return bool(allowed), float(tokens)
+
+    def __len__(self):
+        return sum(1 for _ in self._client.scan_iter(match=self.prefix + "*"))
+
+'''
+Shared bucket store for when several gunicorn workers (or servers) should enforce one limit per client together, it works with Redis or anything that speaks its protocol.
+Buckets expire on their own once they would be full again. Any other store only needs a take(key, cost, rate, burst) method that returns whether the tokens were taken
+and how many are left. The redis package is only imported when this store is used.
+'''
+
+
+class RateLimiter:
+    def __init__(self, store, rate=20.0, burst=40, costs=None):
+        self.store = store
+        self.rate = rate
+        self.burst = burst
+        self.costs = dict(costs or {})
+        self.limited = 0
+        self._lock = threading.Lock()
+
+    def cost(self, endpoint):
+        return min(self.costs.get(endpoint, 1), self.burst)
+
+    def check(self, client, endpoint):
+        cost = self.cost(endpoint)
+        allowed, tokens = self.store.take(client, cost, self.rate, self.burst)
+        if allowed:
+            return None
+        with self._lock:
+            self.limited += 1
+        return (cost - tokens) / self.rate
+
+    def metric_lines(self):
+        return gauge('rate_limited_requests_total', 'Requests turned away with a 429 because their client was out of tokens.', self.limited)
+
+'''
+Token bucket rate limiting per client. Every client gets a bucket of burst tokens that refills at rate tokens a second, and each request takes its endpoint's cost out
+of it (1 unless costs says otherwise, and never more than burst so every route stays reachable). check returns None when the request may go ahead, or how many seconds
+until the client has enough tokens again.
+'''
+
+
+class ConcurrencyLimiter:
+    def __init__(self, max_concurrent, wait_timeout=0.1):
+        self.max_concurrent = max_concurrent
+        self.wait_timeout = wait_timeout
+        self.in_flight = 0
+        self.shed = 0
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            with self._lock:
+                self.shed += 1
+            return False
+        with self._lock:
+            self.in_flight += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def metric_lines(self):
+        return (gauge('admission_in_flight', 'Requests currently admitted by the concurrency limiter.', self.in_flight)
+                + gauge('admission_shed_total', 'Requests turned away with a 503 because every slot stayed taken.', self.shed))
+
+'''
+Caps how many requests this worker handles at once. A request waits at most wait_timeout seconds for a slot and is turned away otherwise, so under overload the extra
+requests get a quick 503 instead of queueing for a database connection and dragging every other request's latency up with them.
+'''
+
+
+def client_key(header):
+    api_key = request.headers.get(header)
+    if api_key:
+        return "key:" + api_key
+    return "ip:" + (request.remote_addr or "unknown")
+
+# Identifies who a request is from for rate limiting, by its API key when it sends one and by its IP address otherwise
+
+
+def too_busy(status, message, retry_after):
+    response = jsonify({"error": message, "retry_after": retry_after})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(math.ceil(retry_after), 1))
+    return response
+
+# Builds a 429 or 503 response telling the client how long to wait before trying again
+
+
+def create_rate_limiter(config):
+    if config.get('RATE_LIMIT_URL'):
+        store = RedisBucketStore(config['RATE_LIMIT_URL'])
+    else:
+        store = MemoryBucketStore(config.get('RATE_LIMIT_MAX_CLIENTS', 100000))
+    return RateLimiter(store, rate=config.get('RATE_LIMIT_PER_SECOND', 20.0), burst=config.get('RATE_LIMIT_BURST', 40), costs=config.get('RATE_LIMIT_COSTS'))
+
+# Builds the rate limiter from our app config, using Redis when RATE_LIMIT_URL is set and the in-process store otherwise
+
+
+def init_admission_control(app):
+    limiter = create_rate_limiter(app.config) if app.config.get('RATE_LIMIT_ENABLED') else None
+    concurrency = ConcurrencyLimiter(app.config['MAX_CONCURRENT_REQUESTS'], app.config.get('CONCURRENCY_WAIT_MS', 100) / 1000) if app.config.get('MAX_CONCURRENT_REQUESTS') else None
+    if limiter is None and concurrency is None:
+        return
+    app.extensions['rate_limiter'] = limiter
+    app.extensions['concurrency_limiter'] = concurrency
+    key_header = app.config.get('RATE_LIMIT_KEY_HEADER', 'X-API-Key')
+
+    @app.before_request
+    def admit_request():
+        if request.endpoint in EXEMPT_ENDPOINTS:
+            return None
+        if limiter is not None:
+            retry_after = limiter.check(client_key(key_header), request.endpoint)
+            if retry_after is not None:
+                return too_busy(429, "Rate limit exceeded", retry_after)
+        if concurrency is not None:
+            if not concurrency.acquire():
+                return too_busy(503, "Server is busy, try again shortly", 1)
+            g.admission_slot = True
+        return None
+
+    @app.teardown_request
+    def release_admission_slot(exc):
+        if g.pop('admission_slot', False):
+            concurrency.release()
+
+'''
+Turns on admission control for our app when RATE_LIMIT_ENABLED is on and/or MAX_CONCURRENT_REQUESTS is above 0. Before any route runs, the client has to have enough
+tokens for the route (or gets a 429) and then has to get one of this worker's slots (or gets a 503), both with a Retry-After header, so an expensive request that would
+be turned away never touches the database. The slot is given back when the request context is torn down, which for streamed responses is after the last chunk is sent.
+Clients are told apart by RATE_LIMIT_KEY_HEADER or their IP, and since API keys are not checked here, a client that makes up a new key for every request gets a new
+bucket each time. Behind a proxy the IP is the proxy's unless werkzeug's ProxyFix is set up.
+'''
@@ -0,0 +1,184 @@
+from marshmallow import fields, validate, validates_schema, ValidationError, EXCLUDE
+from extensions import ma
+from metrics import serialization_timer
+
+# Imports marshmallow, our Marshmallow extension and the timer used to report serialization time in /metrics
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_BULK_BATCH_SIZE = 10000
+
+# Page size used by list endpoints when no limit is given, the largest limit a client may ask for, and the largest batch_size a client may ask the bulk endpoints for
+
+class BaseSchema(ma.Schema):
+    def dump(self, obj, *, many=None):
+        with serialization_timer():
+            return super().dump(obj, many=many)
+
+    def jsonify(self, obj, many=None, *args, **kwargs):
+        with serialization_timer():
+            return super().jsonify(obj, many, *args, **kwargs)
+
+# Base class for all of our schemas that times every dump and jsonify call so /metrics can report how long each endpoint spends serializing
+
+class CustomerSchema(BaseSchema):
+    customer_id = fields.Int(dump_only=True)
+    name = fields.Str(required=True)
+    email = fields.Str(required=True)
+    phone = fields.Str(required=True)
+    updated_at = fields.DateTime(dump_only=True)
+
+    class Meta:
+        fields = ("customer_id", "name", "email", "phone", "updated_at")
+
+class CustomerAccountSchema(BaseSchema):
+    account_id = fields.Int(dump_only=True)
+    customer_id = fields.Int(required=True)
+    username = fields.Str(required=True)
+    password = fields.Str(required=True)
+
+    class Meta:
+        fields = ("account_id", "customer_id", "username", "password")
+
+class ProductSchema(BaseSchema):
+    product_id = fields.Int(dump_only=True)
+    name = fields.Str(required=True)
+    product_type = fields.Str(required=True)
+    price = fields.Float(required=True)
+    updated_at = fields.DateTime(dump_only=True)
+
+    class Meta:
+        fields = ("product_id", "name", "product_type", "price", "updated_at")
+
+class OrderItemSchema(BaseSchema):
+    product_id = fields.Int(required=True)
+    quantity = fields.Int(load_default=1, validate=validate.Range(min=1))
+    unit_price = fields.Float(dump_only=True)
+
+    class Meta:
+        fields = ("product_id", "quantity", "unit_price")
+
+class OrderItemsChangeSchema(BaseSchema):
+    add = fields.List(fields.Nested(OrderItemSchema), load_default=list)
+    remove = fields.List(fields.Int(), load_default=list)
+
+    @validates_schema
+    def validate_not_empty(self, data, **kwargs):
+        if not data['add'] and not data['remove']:
+            raise ValidationError("add or remove at least one product")
+
+class OrderSchema(BaseSchema):
+    order_id = fields.Int(dump_only=True)
+    customer_id = fields.Int(required=True)
+    date = fields.Date(required=True)
+    order_status = fields.Str(required=True)
+    items = fields.List(fields.Nested(OrderItemSchema))
+    total_price = fields.Float(required=True, validate=validate.Range(min=0))
+
+    class Meta:
+        fields = ("order_id", "customer_id", "date", "order_status", "items", "total_price")
+
+class CustomerOrderSummarySchema(BaseSchema):
+    customer_id = fields.Int(dump_only=True)
+    order_count = fields.Int(dump_only=True)
+    lifetime_spend = fields.Float(dump_only=True)
+    last_order_date = fields.Date(dump_only=True)
+
+class OrderDetailSchema(BaseSchema):
+    order_id = fields.Int(required=True)
+    product_id = fields.Int(required=True)
+    quantity = fields.Int(load_default=1, validate=validate.Range(min=1))
+    unit_price = fields.Float(dump_only=True)
+
+    class Meta:
+        fields = ("order_id", "product_id", "quantity", "unit_price")
+
+class PageArgsSchema(BaseSchema):
+    limit = fields.Int(validate=validate.Range(min=1, max=MAX_PAGE_SIZE))
+    after = fields.Int(validate=validate.Range(min=0))
+    format = fields.Str(load_default="json", validate=validate.OneOf(["json", "ndjson"]))
+
+    class Meta:
+        unknown = EXCLUDE
+
+class ProductFilterSchema(BaseSchema):
+    product_type = fields.Str(data_key="type")
+    name = fields.Str(validate=validate.Length(min=1))
+    min_price = fields.Float(validate=validate.Range(min=0))
+    max_price = fields.Float(validate=validate.Range(min=0))
+
+    @validates_schema
+    def validate_price_range(self, data, **kwargs):
+        if 'min_price' in data and 'max_price' in data and data['min_price'] > data['max_price']:
+            raise ValidationError("min_price must not be greater than max_price", "min_price")
+
+    class Meta:
+        unknown = EXCLUDE
+
+class OrderFilterSchema(BaseSchema):
+    customer_id = fields.Int()
+    order_status = fields.Str(data_key="status")
+    date_from = fields.Date()
+    date_to = fields.Date()
+
+    @validates_schema
+    def validate_date_range(self, data, **kwargs):
+        if 'date_from' in data and 'date_to' in data and data['date_from'] > data['date_to']:
+            raise ValidationError("date_from must not be after date_to", "date_from")
+
+    class Meta:
+        unknown = EXCLUDE
+
+class OrderExportSchema(BaseSchema):
+    format = fields.Str(load_default="csv", validate=validate.OneOf(["csv", "ndjson"]))
+    date_from = fields.Date()
+    date_to = fields.Date()
+    since = fields.Int(validate=validate.Range(min=0))
+
+    @validates_schema
+    def validate_date_range(self, data, **kwargs):
+        if 'date_from' in data and 'date_to' in data and data['date_from'] > data['date_to']:
+            raise ValidationError("date_from must not be after date_to", "date_from")
+
+    class Meta:
+        unknown = EXCLUDE
+
+class BulkCustomerSchema(CustomerSchema):
+    customer_id = fields.Int(validate=validate.Range(min=1))
+
+class BulkProductSchema(ProductSchema):
+    product_id = fields.Int(validate=validate.Range(min=1))
+
+class BulkArgsSchema(BaseSchema):
+    batch_size = fields.Int(validate=validate.Range(min=1, max=MAX_BULK_BATCH_SIZE))
+
+    class Meta:
+        unknown = EXCLUDE
+
+# Creates Schemas for all of the tables we will be creating, plus the query string arguments used to page through and filter list endpoints and to size bulk writes
+# The bulk schemas also accept an existing ID so that row is updated instead of inserted
+
+
+customer_schema = CustomerSchema()
+customers_schema = CustomerSchema(many=True)
+customer_account_schema = CustomerAccountSchema()
+customer_accounts_schema = CustomerAccountSchema(many=True)
+product_schema = ProductSchema()
+products_schema = ProductSchema(many=True)
+order_item_schema = OrderItemSchema()
+order_items_schema = OrderItemSchema(many=True)
+order_items_change_schema = OrderItemsChangeSchema()
+order_schema = OrderSchema()
+orders_schema = OrderSchema(many=True)
+customer_order_summary_schema = CustomerOrderSummarySchema()
+order_detail_schema = OrderDetailSchema()
+order_details_schema = OrderDetailSchema(many=True)
+page_args_schema = PageArgsSchema()
+product_filter_schema = ProductFilterSchema()
+order_filter_schema = OrderFilterSchema()
+order_export_schema = OrderExportSchema()
+bulk_customers_schema = BulkCustomerSchema(many=True)
+bulk_products_schema = BulkProductSchema(many=True)
+bulk_args_schema = BulkArgsSchema()
+
+# Instantiates Schema classes
@@ -0,0 +1,175 @@
+import datetime
+from flask.json.provider import DefaultJSONProvider
+from marshmallow import fields
+from sqlalchemy import select
+from extensions import db
+from metrics import serialization_timer
+from models import Customer, CustomerAccount, Product, Order
+from schemas import customers_schema, customer_accounts_schema, products_schema, orders_schema
+
+STREAM_CHUNK_SIZE = 500
+
+# Imports what our fast serializers need, and sets how many rows are fetched per round trip when streaming NDJSON
+
+
+def field_converter(field):
+    if isinstance(field, fields.Integer):
+        return "int({})"
+    if isinstance(field, fields.Float):
+        return "float({})"
+    if isinstance(field, fields.String):
+        return "str({})"
+    if isinstance(field, fields.Date) and field.format in (None, "iso", "iso8601"):
+        return "_date({})"
+    if isinstance(field, fields.DateTime) and field.format in (None, "iso", "iso8601"):
+        return "_datetime({})"
+    if isinstance(field, fields.List) and isinstance(field.inner, fields.Nested):
+        return None
+    raise TypeError(f"No fast serializer for {type(field).__name__} fields")
+
+'''
+Returns the expression that converts a value the same way marshmallow's field would, as a format string for the generated code. Nested lists return None since they
+are compiled into their own serializer. Any other field type raises so that adding one to a schema is noticed here instead of silently producing different output.
+'''
+
+
+def compile_dump(schema, model, from_rows):
+    names, lines, namespace = [], [], {"_date": datetime.date.isoformat, "_datetime": datetime.datetime.isoformat}
+    for name, field in schema.dump_fields.items():
+        attribute = field.attribute or name
+        if not hasattr(model, attribute):
+            continue
+        converter = field_converter(field)
+        value = f"row[{len(names)}]" if from_rows else f"row.{attribute}"
+        if converter is None:
+            nested = ObjectSerializer(field.inner.schema, getattr(model, attribute).property.mapper.class_)
+            namespace[f"_nested_{name}"] = nested.dump_one
+            expression = f"[_nested_{name}(item) for item in v]"
+        else:
+            expression = converter.format("v")
+        names.append((name, attribute))
+        lines.append(f"    {name!r}: None if (v := {value}) is None else {expression},")
+    source = "def dump_one(row):\n    return {\n" + "\n".join(lines) + "\n    }\n"
+    exec(source, namespace)
+    return names, namespace["dump_one"]
+
+'''
+Generates a function that turns one row into the same dict the marshmallow schema would dump, with every field's conversion written out inline instead of going
+through marshmallow's per field dispatch. Rows are either tuples from a select() of columns (from_rows) or ORM objects. Just like marshmallow, fields the model
+does not have are left out, for example the password field on CustomerAccountSchema.
+'''
+
+
+def keyset_chunks(fetch, query, key, limit=None):
+    chunk_query = query
+    while limit is None or limit > 0:
+        size = STREAM_CHUNK_SIZE if limit is None else min(STREAM_CHUNK_SIZE, limit)
+        chunk = fetch(chunk_query.limit(size))
+        if not chunk:
+            return
+        after = getattr(chunk[-1], key.key)
+        yield chunk
+        if len(chunk) < size:
+            return
+        if limit is not None:
+            limit -= size
+        chunk_query = query.where(key > after)
+
+'''
+Runs a query that is ordered by key STREAM_CHUNK_SIZE rows at a time, each chunk starting after the last key of the one before, and yields each chunk (at most limit
+rows in all). This streams with every driver, including mysqlconnector which cannot use server side cursors and would otherwise read the whole result into memory
+before handing back the first row. Each chunk is one indexed range scan, so a chunk deep into the table costs the same as the first one.
+'''
+
+
+class RowSerializer:
+    def __init__(self, schema, model):
+        names, self.dump_one = compile_dump(schema, model, from_rows=True)
+        self.columns = [getattr(model, attribute) for name, attribute in names]
+
+    def select(self, options=()):
+        return select(*self.columns)
+
+    def fetch(self, query):
+        return db.session.execute(query).all()
+
+    def partitions(self, query, key, limit=None):
+        return keyset_chunks(self.fetch, query, key, limit)
+
+    def dump(self, rows):
+        with serialization_timer():
+            return [self.dump_one(row) for row in rows]
+
+'''
+Fast serializer for flat schemas. It selects only the schema's columns so no ORM objects are built at all, and dumps each row tuple with the generated function.
+'''
+
+
+class ObjectSerializer:
+    def __init__(self, schema, model):
+        self.model = model
+        names, self.dump_one = compile_dump(schema, model, from_rows=False)
+
+    def select(self, options=()):
+        return select(self.model).options(*options)
+
+    def fetch(self, query):
+        return db.session.execute(query).unique().scalars().all()
+
+    def partitions(self, query, key, limit=None):
+        for chunk in keyset_chunks(self.fetch, query, key, limit):
+            yield chunk
+            for row in chunk:
+                db.session.expunge(row)
+
+    def dump(self, rows):
+        with serialization_timer():
+            return [self.dump_one(row) for row in rows]
+
+'''
+Fast serializer for schemas with nested relationships, like orders and their lines. It still loads ORM objects so eager loading options can be passed to select,
+but dumps them with the generated function. When streaming, each chunk is expunged once written so memory stays flat.
+'''
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    def response(self, *args, **kwargs):
+        with serialization_timer():
+            return super().response(*args, **kwargs)
+
+# Flask's own JSON provider, except that encoding every jsonify response counts as serialization time in /metrics just like the dump that built the data
+
+
+class OrjsonProvider(TimedJSONProvider):
+    def __init__(self, app):
+        import orjson
+        super().__init__(app)
+        self._orjson = orjson
+        self._options = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj, **kwargs):
+        return self._orjson.dumps(obj, default=self.default, option=self._options).decode()
+
+    def loads(self, s, **kwargs):
+        return self._orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if self._app.debug:
+            return super().response(*args, **kwargs)
+        with serialization_timer():
+            obj = self._prepare_response_obj(args, kwargs)
+            return self._app.response_class(self._orjson.dumps(obj, default=self.default, option=self._options) + b"\n", mimetype=self.mimetype)
+
+'''
+Optional JSON provider backed by orjson, turned on with JSON_PROVIDER=orjson. Keys are sorted like Flask's default provider, but orjson writes non ASCII characters
+as UTF-8 instead of \\u escapes and formats some floats differently (1e16 instead of 1e+16), so responses are equivalent JSON but not always byte-identical to the
+default provider. Debug mode still uses the default provider so responses stay indented.
+'''
+
+
+customer_serializer = RowSerializer(customers_schema, Customer)
+customer_account_serializer = RowSerializer(customer_accounts_schema, CustomerAccount)
+product_serializer = RowSerializer(products_schema, Product)
+order_serializer = ObjectSerializer(orders_schema, Order)
+
+# Compiles a fast serializer for each of our read endpoints from the same schemas marshmallow uses, so they always dump the same fields
@@ -0,0 +1,66 @@
+from sqlalchemy import delete, func, insert, select, update
+from extensions import db
+from models import CustomerOrderSummary, Order, OrderItem
+from bulk import upsert_statement
+
+# Imports what we need to keep the Customer_Order_Summary table in step with Orders
+
+def last_order_date(customer_id):
+    return select(func.max(Order.date)).where(Order.customer_id == customer_id).scalar_subquery()
+
+# Subquery for a customer's latest order date, answered straight from the (customer_id, date) index on Orders
+
+def record_order_change(customer_id, orders, spend):
+    if customer_id is None:
+        return
+    table = CustomerOrderSummary.__table__
+    db.session.flush()
+    db.session.execute(upsert_statement(table, [], {
+        "order_count": table.c.order_count + orders,
+        "lifetime_spend": table.c.lifetime_spend + spend,
+        "last_order_date": last_order_date(customer_id),
+    }).values(customer_id=customer_id, order_count=orders, lifetime_spend=spend, last_order_date=last_order_date(customer_id)))
+
+'''
+Adds orders to the customer's order count and spend to their lifetime spend (use negative numbers when an order is removed), creating their summary row the first time.
+It is one INSERT ... ON DUPLICATE KEY UPDATE (or ON CONFLICT on SQLite) that adds to the stored values, so concurrent orders for the same customer cannot overwrite each
+other, and it runs in the caller's transaction so the summary is committed together with the order. Pending order changes are flushed first so the latest order date
+is read back from Orders, which also handles the latest order being deleted or moved to another date.
+'''
+
+def refresh_order_totals(order_ids):
+    order_ids = list(order_ids)
+    if not order_ids:
+        return
+    old_totals = db.session.execute(select(Order.order_id, Order.customer_id, Order.total_price).where(Order.order_id.in_(order_ids)).with_for_update()).all()
+    line_total = (select(func.coalesce(func.sum(OrderItem.quantity * OrderItem.unit_price), 0))
+                  .where(OrderItem.order_id == Order.order_id).scalar_subquery())
+    db.session.execute(update(Order).where(Order.order_id.in_(order_ids)).values(total_price=line_total).execution_options(synchronize_session=False))
+    new_totals = dict(db.session.execute(select(Order.order_id, Order.total_price).where(Order.order_id.in_(order_ids))).all())
+    spend = {}
+    for order_id, customer_id, total_price in old_totals:
+        spend[customer_id] = spend.get(customer_id, 0) + new_totals[order_id] - total_price
+    for customer_id, change in spend.items():
+        if change:
+            record_order_change(customer_id, 0, change)
+
+'''
+Recomputes the stored total of every order in order_ids from its Order_Detail lines with one correlated UPDATE, for when lines were written straight to the table
+(like the bulk order details route and change_order_items) instead of through the Order model. Whatever each total moved by is then added to its customer's lifetime spend, once per customer.
+Runs in the caller's transaction like record_order_change, and the caller should already hold the orders' locks (see lock_orders in order_items.py). The old totals
+are read with a locking read anyway, which on MySQL always returns the latest committed totals even when the transaction's snapshot is older than another worker's
+commit, so that worker's change is never counted twice.
+'''
+
+def rebuild_customer_summaries():
+    table = CustomerOrderSummary.__table__
+    db.session.execute(delete(table))
+    db.session.execute(insert(table).from_select(
+        ["customer_id", "order_count", "lifetime_spend", "last_order_date"],
+        select(Order.customer_id, func.count(), func.coalesce(func.sum(Order.total_price), 0), func.max(Order.date))
+        .where(Order.customer_id.is_not(None))
+        .group_by(Order.customer_id),
+    ))
+    db.session.commit()
+
+# Recomputes every summary from the Orders table in one INSERT ... SELECT, used to fill it in for an existing database or after orders were loaded without going through our routes
@@ -0,0 +1,54 @@
+import pytest
+from sqlalchemy import event
+from app import create_app
+from extensions import db
+
+# Imports what our tests share. Run them from the repo root with: python -m pytest
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    apps = []
+
+    def make_app(**config):
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}", "METRICS_ENABLED": False, "CATALOG_CACHE_TTL": 0, **config})
+        with app.app_context():
+            db.create_all()
+        apps.append(app)
+        return app
+
+    yield make_app
+    for app in apps:
+        with app.app_context():
+            db.engine.dispose()
+
+# Builds an app on this test's own SQLite file with the tables already created, any settings passed in go on top of the defaults. A file instead of sqlite:// so
+# tests can hit it from several threads
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+# An app with our default settings
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def statements(app):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', record)
+    yield statements
+    with app.app_context():
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+# Every SQL statement the app sends from here on, clear it right before the request you want to count
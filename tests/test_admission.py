@@ -0,0 +1,88 @@
+import threading
+import time
+import pytest
+import serializers
+
+# Checks that admission control turns a noisy client away without slowing down or refusing anybody else
+
+
+def statuses(client, url, api_key, count):
+    return [client.get(url, headers={"X-API-Key": api_key}).status_code for _ in range(count)]
+
+# Sends the same GET count times under one API key and returns the status codes
+
+
+@pytest.fixture
+def seeded(client):
+    client.post('/customers', json={"name": "Ann", "email": "ann@example.com", "phone": "555-0100"})
+    for number in range(3):
+        client.post('/products', json={"name": f"Product {number}", "price": 2.5, "product_type": "toy"})
+        client.post('/orders', json={"customer_id": 1, "date": "2024-01-01", "order_status": "new", "products": [number + 1]})
+
+# A customer, three products and an order for each, so the list endpoints have something to return
+
+
+def test_client_out_of_tokens_gets_429(make_app):
+    client = make_app(RATE_LIMIT_ENABLED=True, RATE_LIMIT_PER_SECOND=0.5, RATE_LIMIT_BURST=5).test_client()
+    assert statuses(client, '/products', "noisy", 7) == [200] * 5 + [429] * 2
+    response = client.get('/products', headers={"X-API-Key": "noisy"})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert response.json["error"] == "Rate limit exceeded"
+    assert statuses(client, '/products', "quiet", 5) == [200] * 5
+
+# Each client has its own bucket, so once the noisy one runs out the quiet one still gets its full burst
+
+
+def test_expensive_routes_cost_more_tokens(make_app):
+    client = make_app(RATE_LIMIT_ENABLED=True, RATE_LIMIT_PER_SECOND=0.5, RATE_LIMIT_BURST=6, RATE_LIMIT_COSTS={"orders.get_all_orders": 3}).test_client()
+    assert statuses(client, '/orders', "reporting", 3) == [200, 200, 429]
+    assert statuses(client, '/products', "reporting", 1) == [429]
+
+# GET /orders takes 3 tokens here, so a burst of 6 covers only two of them and nothing is left for cheaper routes either
+
+
+def test_busy_worker_sheds_with_503(make_app, monkeypatch):
+    monkeypatch.setattr(serializers, "STREAM_CHUNK_SIZE", 1)
+    app = make_app(MAX_CONCURRENT_REQUESTS=1, CONCURRENCY_WAIT_MS=10)
+    client = app.test_client()
+    for number in range(3):
+        client.post('/products', json={"name": f"Product {number}", "price": 2.5, "product_type": "toy"})
+    streaming = client.get('/products?format=ndjson', buffered=False)
+    assert app.extensions['concurrency_limiter'].in_flight == 1
+    response = client.get('/products')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == "1"
+    streaming.close()
+    assert app.extensions['concurrency_limiter'].in_flight == 0
+    assert client.get('/products').status_code == 200
+
+# A half sent NDJSON stream keeps the only slot taken, so the next request is turned away after waiting 10 ms and gets in again once the stream is closed
+
+
+def test_quiet_clients_get_through_while_noisy_one_is_limited(make_app, seeded):
+    rate, burst = 5, 10
+    app = make_app(RATE_LIMIT_ENABLED=True, RATE_LIMIT_PER_SECOND=rate, RATE_LIMIT_BURST=burst, RATE_LIMIT_COSTS={})
+    noisy, quiet = [], []
+
+    def send(results, url, api_key, count, interval=0.0):
+        client = app.test_client()
+        for _ in range(count):
+            results.extend(statuses(client, url, api_key, 1))
+            time.sleep(interval)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=send, args=(noisy, '/orders', "noisy", 40)) for _ in range(8)]
+    threads += [threading.Thread(target=send, args=(quiet, f'/orders/{number}', f"quiet-{number}", 10, 0.05)) for number in (1, 2, 3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    assert quiet == [200] * 30
+    assert set(noisy) == {200, 429}
+    assert noisy.count(200) <= burst + rate * elapsed + 1
+
+# Eight threads hammer GET /orders under one key while three clients fetch single orders at a steady pace under their own. The noisy client gets no more than its
+# burst plus what refilled while the test ran, and every quiet request still succeeds
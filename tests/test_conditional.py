@@ -0,0 +1,46 @@
+import pytest
+
+# Checks that a conditional GET for customers is answered from updated_at alone and that the ETags match the ones sent with the full response
+
+
+@pytest.fixture
+def customers(client):
+    for number in range(3):
+        client.post('/customers', json={"name": f"Customer {number}", "email": f"customer{number}@example.com", "phone": "555-0100"})
+    return 3
+
+# Three customers so the listing below has a next page
+
+
+@pytest.mark.parametrize("url", ['/customers/2', '/customers?limit=2'])
+def test_not_modified_reads_only_updated_at(client, statements, customers, url):
+    first = client.get(url)
+    assert first.status_code == 200
+    statements.clear()
+    response = client.get(url, headers={"If-None-Match": first.headers['ETag']})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == first.headers['ETag']
+    assert response.headers.get('Link') == first.headers.get('Link')
+    assert len(statements) == 1, statements
+    assert "email" not in statements[0], statements
+
+# A 304 takes one small query for the validators and never selects the rest of the row, and keeps the next page link
+
+
+@pytest.mark.parametrize("url", ['/customers/2', '/customers?limit=2'])
+def test_stale_copy_gets_the_full_response(client, customers, url):
+    first = client.get(url)
+    assert client.put('/customers/2', json={"name": "Renamed", "email": "customer1@example.com", "phone": "555-0100"}).status_code == 200
+    response = client.get(url, headers={"If-None-Match": first.headers['ETag']})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != first.headers['ETag']
+    assert response.headers['ETag'] == client.get(url).headers['ETag']
+    assert "Renamed" in response.get_data(as_text=True)
+
+# Once the customer changes the old ETag no longer matches, and the body and ETag are the same ones an unconditional GET returns
+
+
+def test_missing_customer_is_not_found(client, customers):
+    assert client.get('/customers/99', headers={"If-None-Match": '"stale"'}).status_code == 404
+
+# A conditional GET for a customer that does not exist is still a 404
@@ -0,0 +1,32 @@
+import os
+import signal
+import pytest
+from werkzeug.security import check_password_hash
+from hashing import PasswordHasher
+
+# Checks that the password hashing pool survives losing a worker process
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000', workers=1, wait_timeout=30)
+    yield hasher
+    hasher.shutdown()
+
+# A one process pool with a cheap hashing method so the tests stay fast
+
+
+@pytest.mark.skipif(not hasattr(signal, 'SIGKILL'), reason="needs SIGKILL to kill the worker")
+def test_pool_is_replaced_after_a_worker_dies(hasher):
+    assert check_password_hash(hasher.hash("first"), "first")
+    broken = hasher._executor
+    for process in list(broken._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+        process.join()
+
+    assert check_password_hash(hasher.hash("second"), "second")
+    assert hasher._executor is not broken
+    assert hasher.restarts == 1
+    assert hasher.verify(hasher.hash("third"), "third")
+
+# The worker is killed like the OOM killer would, the next hash has to come back from a fresh pool instead of raising BrokenProcessPool forever
@@ -0,0 +1,32 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from extensions import db
+
+# Checks the SQL timing hooks behind /metrics
+
+
+def test_failed_statements_leave_nothing_behind_on_the_connection(make_app):
+    app = make_app(METRICS_ENABLED=True)
+    with app.app_context():
+        connection = db.session.connection()
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                db.session.execute(text("SELECT * FROM no_such_table"))
+            db.session.rollback()
+            connection = db.session.connection()
+        db.session.execute(text("SELECT 1"))
+        assert 'query_start_time' not in connection.info
+
+# A statement that raises never reaches after_cursor_execute, so its start time must not stay on the pooled connection for good
+
+
+def test_requests_count_their_statements(make_app):
+    app = make_app(METRICS_ENABLED=True)
+    client = app.test_client()
+    client.get('/orders/1')
+    metrics = client.get('/metrics').get_data(as_text=True)
+    assert 'db_queries_per_request_count{endpoint="orders.get_order",method="GET"} 1' in metrics
+    assert 'db_queries_per_request_sum{endpoint="orders.get_order",method="GET"} 1' in metrics
+
+# The hooks still add every statement to the request that ran it
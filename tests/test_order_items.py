@@ -0,0 +1,83 @@
+import random
+import threading
+from extensions import db
+from benchmarks.order_items import check_consistency, hot_order_quantity
+
+# Checks that PATCH /orders/<id>/items never loses a change when many writers hit the same orders at once
+
+
+def test_parallel_line_changes_are_not_lost(app, client):
+    client.post('/customers', json={"name": "Ann", "email": "ann@example.com", "phone": "555-0100"})
+    for number in range(5):
+        client.post('/products', json={"name": f"Product {number}", "price": 1.1 + number, "product_type": "toy"})
+    for products in ([1], [2, 3]):
+        client.post('/orders', json={"customer_id": 1, "date": "2024-01-01", "order_status": "new", "products": products})
+    with app.app_context():
+        quantity_before = hot_order_quantity([1, 2])
+
+    statuses = []
+
+    def writer(seed):
+        rng = random.Random(seed)
+        writer_client = app.test_client()
+        for _ in range(15):
+            body = {"add": [{"product_id": rng.randint(1, 5), "quantity": 1}]}
+            statuses.append(writer_client.patch(f'/orders/{rng.choice([1, 2])}/items', json=body).status_code)
+
+    threads = [threading.Thread(target=writer, args=(seed,)) for seed in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [200] * 120
+    with app.app_context():
+        consistency = check_consistency([1, 2], quantity_before + len(statuses))
+        db.session.commit()
+    assert consistency["lost_updates"] == 0
+    assert consistency["orders_with_wrong_total"] == 0
+    assert consistency["summaries_match_rebuild"]
+
+# Eight threads each add 15 units to the same two orders, new lines and existing ones alike. Afterwards both orders must hold exactly 120 more units, their
+# totals must match their lines and the customer summary must match a rebuild
+
+
+def test_bulk_order_details_and_line_changes_keep_summaries_right(app, client):
+    client.post('/customers', json={"name": "Ann", "email": "ann@example.com", "phone": "555-0100"})
+    for number in range(10):
+        client.post('/products', json={"name": f"Product {number}", "price": 1.1 + number, "product_type": "toy"})
+    for products in ([1], [2]):
+        client.post('/orders', json={"customer_id": 1, "date": "2024-01-01", "order_status": "new", "products": products})
+
+    statuses = []
+
+    def patcher(seed):
+        rng = random.Random(seed)
+        writer_client = app.test_client()
+        for _ in range(10):
+            body = {"add": [{"product_id": rng.randint(1, 5), "quantity": 1}]}
+            statuses.append(writer_client.patch(f'/orders/{rng.choice([1, 2])}/items', json=body).status_code)
+
+    def bulk_loader(seed):
+        rng = random.Random(seed)
+        writer_client = app.test_client()
+        for _ in range(5):
+            rows = [{"order_id": rng.choice([1, 2]), "product_id": rng.randint(6, 10), "quantity": 2} for _ in range(3)]
+            statuses.append(writer_client.post('/order_details/bulk?batch_size=2', json=rows).status_code)
+
+    threads = [threading.Thread(target=patcher, args=(seed,)) for seed in range(4)]
+    threads += [threading.Thread(target=bulk_loader, args=(seed,)) for seed in range(4, 8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert set(statuses) == {200, 201}
+    with app.app_context():
+        consistency = check_consistency([1, 2], 0)
+        db.session.commit()
+    assert consistency["orders_with_wrong_total"] == 0
+    assert consistency["summaries_match_rebuild"]
+
+# Bulk order detail uploads and PATCH /orders/<id>/items run against the same two orders at once. The bulk route writes lines straight to Order_Detail, so both have to
+# lock the orders for the totals and the customer's lifetime spend to come out right
@@ -0,0 +1,39 @@
+import datetime
+from decimal import Decimal
+from sqlalchemy.exc import SQLAlchemyError
+import order_pipeline
+from order_pipeline import OrderPipeline
+
+# Checks what the async order pipeline tells clients when a batch goes wrong part way through
+
+
+def make_order(customer_id):
+    return {"customer_id": customer_id, "date": datetime.date(2024, 1, 1), "order_status": "new", "items": {1: 1}, "prices": {1: Decimal("2.50")}}
+
+# An already validated order like POST /orders hands to the pipeline
+
+
+def test_orders_committed_before_a_crash_stay_committed(app, monkeypatch):
+    real_write_orders = order_pipeline.write_orders
+
+    def write_orders(orders):
+        if len(orders) > 1:
+            raise SQLAlchemyError("batch rejected")
+        if orders[0]["customer_id"] == 2:
+            raise RuntimeError("worker bug")
+        return real_write_orders(orders)
+
+    monkeypatch.setattr(order_pipeline, "write_orders", write_orders)
+    pipeline = OrderPipeline(app, workers=1, batch_size=3, batch_wait=1.0)
+    tokens = [pipeline.submit(make_order(customer_id)) for customer_id in (1, 2, 3)]
+    pipeline.join()
+    pipeline.stop()
+
+    first, second, third = [pipeline.status(token) for token in tokens]
+    assert first["status"] == "committed"
+    assert second == third == {"status": "failed", "error": "Internal error"}
+    assert pipeline.stats()["committed"] == 1
+    assert pipeline.stats()["failed"] == 2
+
+# The batch is rejected so the orders are retried one at a time, the first one commits and then the second one blows up with something that is not a database
+# error. The first order has to stay committed and be counted once, only the two that never made it are failed
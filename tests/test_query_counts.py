@@ -0,0 +1,36 @@
+import pytest
+
+# Checks how many SQL statements our order reads cost, so an N+1 query sneaking back in fails the build
+
+
+@pytest.fixture
+def orders(client):
+    client.post('/customers', json={"name": "Ann", "email": "ann@example.com", "phone": "555-0100"})
+    for number in range(3):
+        client.post('/products', json={"name": f"Product {number}", "price": 2.5 + number, "product_type": "toy"})
+    for products in ([1], [1, 2], [1, 2, 3], [3]):
+        assert client.post('/orders', json={"customer_id": 1, "date": "2024-01-01", "order_status": "new", "products": products}).status_code == 201
+    return 4
+
+# One customer with four orders of one to three lines each
+
+
+@pytest.mark.parametrize("url, expected", [('/orders', 2), ('/orders?limit=2', 2), ('/orders?status=new', 2), ('/customers/1/orders', 3)])
+def test_order_lists_take_two_statements(client, statements, orders, url, expected):
+    statements.clear()
+    response = client.get(url)
+    assert response.status_code == 200
+    assert all(order["items"] for order in response.json)
+    assert len(statements) == expected, statements
+
+# A page of orders is one query for the orders and one for all of their lines, however many orders are on the page. /customers/<id>/orders looks the customer up first
+
+
+def test_single_order_takes_one_statement(client, statements, orders):
+    statements.clear()
+    response = client.get('/orders/3')
+    assert response.status_code == 200
+    assert [item["product_id"] for item in response.json["items"]] == [1, 2, 3]
+    assert len(statements) == 1, statements
+
+# A single order is loaded with its lines joined in